@@ -6,6 +6,7 @@ from typing import Dict
 
 from salt_lsp.server import SaltServer, setup_salt_server_capabilities
 from salt_lsp.base_types import StateNameCompletion
+from salt_lsp.utils import LruDict
 
 
 LOG_LEVEL_DICT: Dict[str, int] = {
@@ -18,6 +19,10 @@ LOG_LEVEL_DICT: Dict[str, int] = {
     "debug": logging.DEBUG,
 }
 
+#: number of parsed documents that are kept by their contents, so that
+#: reverting a document to a previous state does not parse it again
+PARSE_CACHE_SIZE = 128
+
 
 def loglevel_from_str(level: str) -> int:
     if level.lower() not in LOG_LEVEL_DICT:
@@ -72,7 +77,9 @@ def main():
 
     salt_server = SaltServer()
     setup_salt_server_capabilities(salt_server)
-    salt_server.post_init(states, log_level)
+    salt_server.post_init(
+        states, log_level, parse_cache=LruDict(PARSE_CACHE_SIZE)
+    )
 
     if args.stop_after_init:
         return
@@ -1,15 +1,33 @@
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple, Union
 
 
 SLS_LANGUAGE_ID = "sls"
 
 
+def _set_slots(obj: Any, state: Any) -> None:
+    """Restore the pickled `state` of an object with ``__slots__``.
+
+    Objects that were pickled before the class got ``__slots__`` store their
+    attributes in a plain dictionary, objects with slots store them as the
+    second element of a tuple.
+    """
+    if isinstance(state, tuple):
+        state = {**(state[0] or {}), **state[1]}
+    for name, value in state.items():
+        object.__setattr__(obj, name, value)
+
+
 @dataclass(frozen=True)
 class StateParameters:
+    __slots__ = ("parameters", "documentation")
+
     parameters: Any
     documentation: Optional[str]
 
+    def __setstate__(self, state: Any) -> None:
+        _set_slots(self, state)
+
 
 class StateNameCompletion:
     """
@@ -17,26 +35,42 @@ class StateNameCompletion:
     documentation about the state.
     """
 
+    __slots__ = ("state_name", "state_params", "state_docs", "state_sub_names")
+
     def __init__(
         self,
         state_name: str,
-        state_params: List[Any],
-        module_docs: Dict[str, str],
+        state_params: Union[List[Any], Mapping[str, Any]],
+        module_docs: Mapping[str, str],
     ) -> None:
+        """
+        :param state_params: the parameters of each submodule of the state,
+            either as a mapping of the submodule names to their parameters or
+            as a list of single entry dictionaries (the output of
+            ``baredoc.list_states``)
+        """
         self.state_name = state_name
         self.state_params: Dict[str, StateParameters] = {}
         self.state_docs: Optional[str] = module_docs.get(state_name)
 
-        for submod in state_params:
-            submod_name = next(iter(submod.keys()))
+        submodules: Iterable[Tuple[str, Any]]
+        if isinstance(state_params, Mapping):
+            submodules = state_params.items()
+        else:
+            submodules = (
+                next(iter(submod.items())) for submod in state_params
+            )
+
+        for submod_name, params in submodules:
             docs = module_docs.get(f"{state_name}.{submod_name}")
 
-            self.state_params[submod_name] = StateParameters(
-                submod[submod_name], docs
-            )
+            self.state_params[submod_name] = StateParameters(params, docs)
 
         self.state_sub_names: List[str] = list(self.state_params.keys())
 
+    def __setstate__(self, state: Any) -> None:
+        _set_slots(self, state)
+
     def provide_subname_completion(self) -> List[Tuple[str, Optional[str]]]:
         """
         This function provides the names and docstrings of the submodules of
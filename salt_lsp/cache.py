@@ -0,0 +1,273 @@
+"""
+On disk cache of the parsed contents of SLS files.
+
+The trees are serialized to JSON together with the modification time of the
+file from which they were created. This allows the server to skip parsing
+included files that have not been modified since the cache was written.
+"""
+from dataclasses import fields, is_dataclass
+import json
+from logging import getLogger
+import os
+import os.path
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+import yaml
+
+from salt_lsp.parser import (
+    AstNode,
+    ExtendNode,
+    IncludeNode,
+    IncludesNode,
+    Position,
+    RequisiteNode,
+    RequisitesNode,
+    StateCallNode,
+    StateNode,
+    StateParameterNode,
+    TokenNode,
+    Tree,
+)
+
+
+log = getLogger(__name__)
+
+#: name of the directory in the workspace root where the cache is stored
+CACHE_DIR_NAME = ".salt-lsp-cache"
+
+#: name of the file inside :py:const:`CACHE_DIR_NAME` storing the trees
+CACHE_FILE_NAME = "trees.json"
+
+#: Version of the cache format, bump it whenever the AST nodes change so that
+#: stale caches are discarded
+CACHE_VERSION = 1
+
+#: key under which the type of a serialized AstNode is stored
+_TYPE_KEY = "__type__"
+
+_NODE_TYPES = {
+    cls.__name__: cls
+    for cls in (
+        ExtendNode,
+        IncludeNode,
+        IncludesNode,
+        RequisiteNode,
+        RequisitesNode,
+        StateCallNode,
+        StateNode,
+        StateParameterNode,
+        Tree,
+    )
+}
+
+
+def _mark_to_json(mark: yaml.Mark) -> Tuple[int, int, int]:
+    return (mark.line, mark.column, mark.index)
+
+
+def _mark_from_json(mark: Any) -> yaml.Mark:
+    line, column, index = mark
+    return yaml.Mark("<unicode string>", index, line, column, None, index)
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, TokenNode):
+        return {
+            _TYPE_KEY: TokenNode.__name__,
+            "token_type": type(value.token).__name__,
+            "attributes": {
+                name: _mark_to_json(attr)
+                if name in ("start_mark", "end_mark")
+                else attr
+                for name, attr in vars(value.token).items()
+            },
+            # the end of block and flow collection tokens is set by the
+            # parser once the collection is closed
+            "start": _to_json(value.start),
+            "end": _to_json(value.end),
+        }
+    if isinstance(value, Position):
+        return (value.line, value.col)
+    if isinstance(value, AstNode) and is_dataclass(value):
+        res = {
+            f.name: _to_json(getattr(value, f.name))
+            for f in fields(value)
+            if f.name != "parent" and f.init
+        }
+        res[_TYPE_KEY] = type(value).__name__
+        return res
+    if isinstance(value, list):
+        return [_to_json(elem) for elem in value]
+    return value
+
+
+def _from_json(value: Any, key: Optional[str] = None) -> Any:
+    if key in ("start", "end"):
+        return None if value is None else Position(*value)
+    if key == "multiline_scalar_lines":
+        return [(first, last) for first, last in value]
+
+    if isinstance(value, list):
+        return [_from_json(elem) for elem in value]
+
+    if not isinstance(value, dict):
+        return value
+
+    node_type = value[_TYPE_KEY]
+    if node_type == TokenNode.__name__:
+        token_type = getattr(yaml.tokens, value["token_type"])
+        token = token_type.__new__(token_type)
+        for name, attr in value["attributes"].items():
+            setattr(
+                token,
+                name,
+                _mark_from_json(attr)
+                if name in ("start_mark", "end_mark")
+                else attr,
+            )
+        token_node = TokenNode(token=token)
+        token_node.start = _from_json(value["start"], "start")
+        token_node.end = _from_json(value["end"], "end")
+        return token_node
+
+    node = _NODE_TYPES[node_type](
+        **{
+            name: _from_json(attr, name)
+            for name, attr in value.items()
+            if name != _TYPE_KEY
+        }
+    )
+
+    # restore the parent references which are not serialized
+    for f in fields(node):
+        child = getattr(node, f.name)
+        for elem in child if isinstance(child, list) else [child]:
+            if isinstance(elem, AstNode) and f.name != "parent":
+                elem.parent = node
+    return node
+
+
+def tree_to_json(tree: Tree) -> Dict[str, Any]:
+    """Convert a tree into a JSON serializable dictionary."""
+    return _to_json(tree)
+
+
+def tree_from_json(data: Dict[str, Any]) -> Tree:
+    """Recreate a tree from the output of :py:func:`tree_to_json`."""
+    tree = _from_json(data)
+    assert isinstance(tree, Tree)
+    return tree
+
+
+class TreeCache:
+    """
+    Cache of parsed trees that is persisted as JSON in
+    :py:const:`CACHE_DIR_NAME` below `root_path`.
+
+    Entries are keyed by the path of the file and are only returned if the
+    modification time of the file did not change since they were added. The
+    cache file is read lazily on the first lookup and only written by
+    :py:meth:`save`.
+    """
+
+    def __init__(self, root_path: Optional[str]) -> None:
+        self._cache_file: Optional[str] = (
+            os.path.join(root_path, CACHE_DIR_NAME, CACHE_FILE_NAME)
+            if root_path and os.path.isdir(root_path)
+            else None
+        )
+
+        #: maps a file path to the mtime and serialized tree
+        self._entries: Optional[Dict[str, Tuple[int, Dict[str, Any]]]] = None
+        self._dirty = False
+
+    def _load(self) -> Dict[str, Tuple[int, Dict[str, Any]]]:
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        if self._cache_file is None or not os.path.exists(self._cache_file):
+            return self._entries
+
+        try:
+            with open(self._cache_file, "r") as cache_file:
+                data = json.load(cache_file)
+            if data.get("version") == CACHE_VERSION:
+                self._entries = {
+                    path: (mtime, tree)
+                    for path, (mtime, tree) in data["trees"].items()
+                }
+        except (OSError, ValueError, KeyError, TypeError) as err:
+            log.error(
+                "Failed to load the tree cache '%s': %s",
+                self._cache_file,
+                err,
+            )
+        return self._entries
+
+    def get(self, path: str, mtime_ns: int) -> Optional[Tree]:
+        """
+        Returns the cached tree of the file at `path` if it was cached with
+        the same modification time or None otherwise.
+        """
+        if self._cache_file is None:
+            return None
+        entry = self._load().get(path)
+        if entry is None or entry[0] != mtime_ns:
+            return None
+        try:
+            return tree_from_json(entry[1])
+        except (AttributeError, KeyError, TypeError, ValueError) as err:
+            log.error("Invalid cache entry for '%s': %s", path, err)
+            return None
+
+    def put(self, path: str, mtime_ns: int, tree: Tree) -> None:
+        """Add the `tree` of the file at `path` with the given mtime."""
+        if self._cache_file is None:
+            return
+        self._load()[path] = (mtime_ns, tree_to_json(tree))
+        self._dirty = True
+
+    def save(self) -> None:
+        """
+        Write the cache to disk if entries were added, dropping the entries of
+        files that no longer exist.
+        """
+        if self._cache_file is None or not self._dirty:
+            return
+
+        assert self._entries is not None
+        cache_dir = os.path.dirname(self._cache_file)
+        tmp_path: Optional[str] = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # write to a temporary file first and move it into place, so that
+            # a crash or a concurrent server never leaves a truncated cache
+            with tempfile.NamedTemporaryFile(
+                "w", dir=cache_dir, suffix=".tmp", delete=False
+            ) as cache_file:
+                tmp_path = cache_file.name
+                json.dump(
+                    {
+                        "version": CACHE_VERSION,
+                        "trees": {
+                            path: entry
+                            for path, entry in self._entries.items()
+                            if os.path.exists(path)
+                        },
+                    },
+                    cache_file,
+                )
+            os.replace(tmp_path, self._cache_file)
+            tmp_path = None
+            self._dirty = False
+        except OSError as err:
+            log.error(
+                "Failed to write the tree cache '%s': %s",
+                self._cache_file,
+                err,
+            )
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -4,10 +4,21 @@ Module defining and building an AST from the SLS file.
 from __future__ import annotations
 
 import logging
+import sys
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from os.path import abspath, dirname, exists, isdir, join
-from typing import Any, Callable, List, Optional, Sequence, Tuple, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    cast,
+)
 
 from pygls.lsp import types
 import yaml
@@ -16,46 +27,67 @@ from yaml.tokens import BlockEndToken, ScalarToken
 
 log = logging.getLogger(__name__)
 
-
-@dataclass
+#: names of the requisites, including their ``_any`` and ``_in`` variants
+REQUISITES_KEYS = frozenset(
+    sys.intern(f"{requisite}{suffix}")
+    for requisite in (
+        "require",
+        "onchanges",
+        "watch",
+        "listen",
+        "prereq",
+        "onfail",
+        "use",
+    )
+    for suffix in ("", "_any", "_in")
+)
+
+#: Loader using libyaml's scanner, it is only available if PyYAML has been
+#: built with libyaml
+CSafeLoader: Optional[Type[Any]] = getattr(yaml, "CSafeLoader", None)
+
+#: keyword arguments for :py:func:`dataclass` that give the nodes
+#: ``__slots__`` instead of a ``__dict__`` on Python versions supporting it
+_SLOTS: Dict[str, bool] = (
+    {"slots": True} if sys.version_info >= (3, 10) else {}
+)
+
+#: tokens opening a block or flow collection
+_BLOCK_START_TOKENS = frozenset(
+    (
+        yaml.BlockMappingStartToken,
+        yaml.BlockSequenceStartToken,
+        yaml.FlowSequenceStartToken,
+        yaml.FlowMappingStartToken,
+    )
+)
+
+#: tokens closing a block or flow collection
+_BLOCK_END_TOKENS = frozenset(
+    (
+        yaml.BlockEndToken,
+        yaml.FlowSequenceEndToken,
+        yaml.FlowMappingEndToken,
+    )
+)
+
+
+@dataclass(order=True, **_SLOTS)
 class Position:
     """
-    Describes a position in the document
+    Describes a position in the document, positions are ordered by their
+    line and then by their column
     """
 
     line: int
     col: int
 
-    def __lt__(self, other):
-        if not isinstance(other, Position):
-            return NotImplemented
-        return (
-            self.line < other.line
-            or self.line == other.line
-            and self.col < other.col
-        )
-
-    def __gt__(self, other):
-        if not isinstance(other, Position):
-            return NotImplemented
-        return (
-            self.line > other.line
-            or self.line == other.line
-            and self.col > other.col
-        )
-
-    def __le__(self, other):
-        return self < other or self == other
-
-    def __ge__(self, other):
-        return self > other or self == other
-
     def to_lsp_pos(self) -> types.Position:
         """Convert this position to pygls' native Position type."""
         return types.Position(line=self.line, character=self.col)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class AstNode(ABC):
     """
     Base class for all nodes of the Abstract Syntax Tree
@@ -65,12 +97,25 @@ class AstNode(ABC):
     end: Optional[Position] = None
     parent: Optional[AstNode] = field(compare=False, default=None, repr=False)
 
+    def get_children(self: AstNode) -> Sequence[AstNode]:
+        """
+        Returns all the children nodes that are visited by :py:meth:`visit`
+        """
+        return ()
+
     def visit(self: AstNode, visitor: Callable[[AstNode], bool]) -> None:
         """
         Apply a visitor function to the node and apply it on children if the
         function returns True.
+
+        The nodes are visited depth first in the order of
+        :py:meth:`get_children`.
         """
-        visitor(self)
+        stack: List[AstNode] = [self]
+        while stack:
+            node = stack.pop()
+            if visitor(node):
+                stack.extend(reversed(node.get_children()))
 
 
 class AstMapNode(AstNode, ABC):
@@ -78,6 +123,8 @@ class AstMapNode(AstNode, ABC):
     Base class for all nodes that are mappings
     """
 
+    __slots__ = ()
+
     @abstractmethod
     def add(self: AstMapNode) -> AstNode:
         """
@@ -92,17 +139,8 @@ class AstMapNode(AstNode, ABC):
         """
         raise NotImplementedError()
 
-    def visit(self, visitor: Callable[[AstNode], bool]) -> None:
-        """
-        Apply a visitor function to the node and apply it on children if the
-        function returns True.
-        """
-        if visitor(self):
-            for child in self.get_children():
-                child.visit(visitor)
 
-
-@dataclass
+@dataclass(**_SLOTS)
 class IncludeNode(AstNode):
     """
     Represents an item in the includes node
@@ -136,7 +174,7 @@ class IncludeNode(AstNode):
         return None
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class IncludesNode(AstNode):
     """
     Node representing the list of includes
@@ -152,7 +190,7 @@ class IncludesNode(AstNode):
         return self.includes[-1]
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class StateParameterNode(AstNode):
     """
     Node representing a parameter of the state definition.
@@ -168,29 +206,14 @@ class StateParameterNode(AstNode):
 
         :return: the node that finally got the name
         """
-        requisites_keys = [
-            "require",
-            "onchanges",
-            "watch",
-            "listen",
-            "prereq",
-            "onfail",
-            "use",
-        ]
-        all_requisites_keys = (
-            requisites_keys
-            + [k + "_any" for k in requisites_keys]
-            + [k + "_in" for k in requisites_keys]
-        )
-        if key in all_requisites_keys and isinstance(
-            self.parent, StateCallNode
-        ):
+        key = sys.intern(key)
+        if key in REQUISITES_KEYS and isinstance(self.parent, StateCallNode):
             return self.parent.convert(self, key)
         self.name = key
         return self
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RequisiteNode(AstNode):
     """
     Node representing one requisite
@@ -206,11 +229,11 @@ class RequisiteNode(AstNode):
         :param key: the module to set
         :return: the node that was updated
         """
-        self.module = key
+        self.module = sys.intern(key)
         return self
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class RequisitesNode(AstMapNode):
     """
     Node Representing the list of requisites of a state
@@ -226,7 +249,7 @@ class RequisitesNode(AstMapNode):
         :param key: the kind to set
         :return: the node that was updated
         """
-        self.kind = key
+        self.kind = sys.intern(key)
         return self
 
     def add(self: RequisitesNode) -> AstNode:
@@ -245,7 +268,7 @@ class RequisitesNode(AstMapNode):
         return self.requisites
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class StateCallNode(AstMapNode):
     """
     Node representing the state call part of the state definition.
@@ -284,7 +307,7 @@ class StateCallNode(AstMapNode):
         """
         Set the name
         """
-        self.name = key
+        self.name = sys.intern(key)
         return self
 
     def convert(
@@ -307,7 +330,7 @@ class StateCallNode(AstMapNode):
         )
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class StateNode(AstMapNode):
     """
     Node representing a state definition like the following.
@@ -351,7 +374,7 @@ class StateNode(AstMapNode):
         return self.states
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ExtendNode(AstMapNode):
     """
     Node representing an ``extend`` declaration
@@ -375,7 +398,7 @@ class ExtendNode(AstMapNode):
         return self.states
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Tree(AstMapNode):
     """
     Node representing the whole SLS file
@@ -385,6 +408,19 @@ class Tree(AstMapNode):
     extend: Optional[ExtendNode] = None
     states: List[StateNode] = field(default_factory=list)
 
+    #: Line ranges (both ends inclusive) of scalars spanning multiple lines
+    #: and of the part of the document that could not be tokenized. Lines in
+    #: these ranges that look like comments can be part of a scalar.
+    multiline_scalar_lines: List[Tuple[int, int]] = field(
+        default_factory=list, compare=False, repr=False
+    )
+
+    #: lazily constructed index of all nodes sorted by their start position,
+    #: see :py:meth:`Tree.nodes_by_start`
+    _nodes_by_start: Optional[
+        Tuple[List[Tuple[int, int, int]], List[AstNode]]
+    ] = field(default=None, init=False, compare=False, repr=False)
+
     def add(self: Tree) -> AstNode:
         """
         Add a key token to the tree, the value will come later
@@ -431,8 +467,41 @@ class Tree(AstMapNode):
             + cast(List[AstNode], self.states)
         )
 
+    def nodes_by_start(
+        self: Tree,
+    ) -> Tuple[List[Tuple[int, int, int]], List[AstNode]]:
+        """
+        Returns all nodes reachable via :py:meth:`visit` that have a start
+        position, sorted by their start and then by their visiting order.
+
+        The first list contains the sort keys ``(line, col, visit_index)``,
+        the second one the corresponding nodes. The result is computed on the
+        first call and then cached, so the tree must not be modified
+        afterwards.
+        """
+        if self._nodes_by_start is None:
+            nodes: List[AstNode] = []
 
-@dataclass(init=False, eq=False)
+            def visitor(node: AstNode) -> bool:
+                if node.start is not None:
+                    nodes.append(node)
+                return True
+
+            self.visit(visitor)
+
+            keyed = sorted(
+                ((start.line, start.col, i), node)
+                for i, node in enumerate(nodes)
+                if (start := node.start) is not None
+            )
+            self._nodes_by_start = (
+                [key for key, _ in keyed],
+                [node for _, node in keyed],
+            )
+        return self._nodes_by_start
+
+
+@dataclass(init=False, eq=False, **_SLOTS)
 class TokenNode(AstNode):
     """
     Wrapper node for unprocessed yaml tokens
@@ -441,7 +510,10 @@ class TokenNode(AstNode):
     token: yaml.Token = field(default_factory=lambda: yaml.Token(0, 0))
 
     def __init__(self: TokenNode, token: yaml.Token) -> None:
-        super().__init__(
+        # zero argument super() does not work in dataclasses with slots, they
+        # are replaced by a new class
+        AstNode.__init__(
+            self,
             start=Position(
                 line=token.start_mark.line, col=token.start_mark.column
             ),
@@ -457,7 +529,7 @@ class TokenNode(AstNode):
 
         is_scalar = isinstance(self.token, yaml.ScalarToken)
         scalar_equal = is_scalar and self.token.value == other.token.value
-        return super().__eq__(other) and (scalar_equal or not is_scalar)
+        return AstNode.__eq__(self, other) and (scalar_equal or not is_scalar)
 
 
 class Parser:
@@ -465,26 +537,23 @@ class Parser:
     SLS file parser class
     """
 
-    def __init__(self: Parser, document: str) -> None:
+    def __init__(
+        self: Parser, document: str, loader: Type[Any] = yaml.SafeLoader
+    ) -> None:
         """
         Create a parser object for an SLS file.
 
         :param document: the content of the SLS file to parse
+        :param loader: the yaml loader whose scanner is used to tokenize the
+            document
         """
         self.document = document
+        self._loader = loader
         self._tree = Tree()
         self._breadcrumbs: List[AstNode] = [self._tree]
-        self._block_starts: List[
-            Tuple[
-                Union[
-                    yaml.BlockMappingStartToken,
-                    yaml.BlockSequenceStartToken,
-                    yaml.FlowSequenceStartToken,
-                    yaml.FlowMappingStartToken,
-                ],
-                AstNode,
-            ],
-        ] = []
+        #: the tokens from _BLOCK_START_TOKENS of the currently open blocks and
+        #: the breadcrumb that was active when they started
+        self._block_starts: List[Tuple[yaml.Token, AstNode]] = []
         self._next_scalar_as_key = False
         #: flag for _process_token that the preceding token was a ValueToken
         #: => if applicable, the next token will be a value, unless a block is
@@ -496,27 +565,28 @@ class Parser:
     def _process_token(self: Parser, token: yaml.Token) -> None:
         """
         Process one token
+
+        The scanner only emits the token classes from :py:mod:`yaml.tokens`,
+        so the type of the token is compared directly instead of using
+        ``isinstance``.
         """
+        token_type = type(token)
         token_start = Position(
             line=token.start_mark.line, col=token.start_mark.column
         )
         token_end = Position(
             line=token.end_mark.line, col=token.end_mark.column
         )
-        if isinstance(token, yaml.StreamStartToken):
+        if token_type is ScalarToken and token_end.line > token_start.line:
+            self._tree.multiline_scalar_lines.append(
+                (token_start.line, token_end.line)
+            )
+        if token_type is yaml.StreamStartToken:
             self._tree.start = token_start
-        if isinstance(token, yaml.StreamEndToken):
+        elif token_type is yaml.StreamEndToken:
             self._tree.end = token_end
 
-        if isinstance(
-            token,
-            (
-                yaml.BlockMappingStartToken,
-                yaml.BlockSequenceStartToken,
-                yaml.FlowSequenceStartToken,
-                yaml.FlowMappingStartToken,
-            ),
-        ):
+        if token_type in _BLOCK_START_TOKENS:
             # Store which block start corresponds to what breadcrumb to help
             # handling end block tokens
             self._block_starts.append((token, self._breadcrumbs[-1]))
@@ -524,44 +594,30 @@ class Parser:
             # be a complex type instead
             self._next_token_is_value = False
 
-        if isinstance(token, yaml.ValueToken):
+        if token_type is yaml.ValueToken:
             self._next_token_is_value = True
-        if isinstance(token, yaml.ValueToken) and isinstance(
-            self._breadcrumbs[-1], StateParameterNode
-        ):
-            if not self._unprocessed_tokens:
+            if (
+                isinstance(self._breadcrumbs[-1], StateParameterNode)
+                and not self._unprocessed_tokens
+            ):
                 self._unprocessed_tokens = []
                 # We don't need to do anything else with this token,
                 # just flag the next tokens to be simply collected
                 return
 
         if self._unprocessed_tokens is not None:
-            if not isinstance(
-                self._breadcrumbs[-1], StateParameterNode
-            ) or not isinstance(token, yaml.BlockEndToken):
-                self._unprocessed_tokens.append(TokenNode(token=token))
-            if isinstance(
-                token,
-                (
-                    yaml.BlockMappingStartToken,
-                    yaml.BlockSequenceStartToken,
-                    yaml.FlowSequenceStartToken,
-                    yaml.FlowMappingStartToken,
-                ),
+            if (
+                not isinstance(self._breadcrumbs[-1], StateParameterNode)
+                or token_type is not BlockEndToken
             ):
+                self._unprocessed_tokens.append(TokenNode(token=token))
+            if token_type in _BLOCK_START_TOKENS:
                 self._breadcrumbs.append(self._unprocessed_tokens[-1])
                 # a block is starting, so the next token cannot be a value, it
                 # will be a complex type instead
                 self._next_token_is_value = False
 
-        if isinstance(
-            token,
-            (
-                yaml.BlockEndToken,
-                yaml.FlowSequenceEndToken,
-                yaml.FlowMappingEndToken,
-            ),
-        ):
+        if token_type in _BLOCK_END_TOKENS:
             if len(self._block_starts) == 0 or len(self._breadcrumbs) == 0:
                 log.error(
                     "Reached a %s but either no block starts "
@@ -604,7 +660,7 @@ class Parser:
             self._next_token_is_value = False
             return
 
-        if isinstance(token, yaml.KeyToken):
+        if token_type is yaml.KeyToken:
             self._next_scalar_as_key = True
             if isinstance(
                 self._breadcrumbs[-1], AstMapNode
@@ -618,7 +674,7 @@ class Parser:
                 else:
                     self._breadcrumbs[-1].start = token_start
 
-        if isinstance(token, yaml.BlockEntryToken):
+        elif token_type is yaml.BlockEntryToken:
             # Create the state parameter, include and requisite before the dict
             # since those are dicts in lists
             same_level = (
@@ -635,13 +691,12 @@ class Parser:
                 self._breadcrumbs.append(self._breadcrumbs[-1].add())
                 self._breadcrumbs[-1].start = token_start
 
-        if isinstance(token, yaml.ScalarToken):
+        elif token_type is ScalarToken:
+            value = cast(ScalarToken, token).value
             if self._next_scalar_as_key and getattr(
                 self._breadcrumbs[-1], "set_key"
             ):
-                changed = getattr(self._breadcrumbs[-1], "set_key")(
-                    token.value
-                )
+                changed = getattr(self._breadcrumbs[-1], "set_key")(value)
                 # If the changed node isn't the same than the one we called the
                 # function on, that means that the node had to be converted and
                 # we need to update the breadcrumbs too.
@@ -656,24 +711,24 @@ class Parser:
                 self._next_scalar_as_key = False
             else:
                 if isinstance(self._breadcrumbs[-1], IncludeNode):
-                    self._breadcrumbs[-1].value = token.value
+                    self._breadcrumbs[-1].value = value
                     self._breadcrumbs[-1].end = token_end
                     self._breadcrumbs.pop()
                 if isinstance(self._breadcrumbs[-1], RequisiteNode):
-                    self._breadcrumbs[-1].reference = token.value
+                    self._breadcrumbs[-1].reference = value
                 # If the user hasn't typed the ':' yet, then the state
                 # parameter will come as a scalar
                 if (
                     isinstance(self._breadcrumbs[-1], StateParameterNode)
                     and self._breadcrumbs[-1].name is None
                 ):
-                    self._breadcrumbs[-1].name = token.value
+                    self._breadcrumbs[-1].name = sys.intern(value)
                 if isinstance(self._breadcrumbs[-1], (StateNode, Tree)):
                     new_node = self._breadcrumbs[-1].add()
                     new_node.start = token_start
                     new_node.end = token_end
                     if getattr(new_node, "set_key"):
-                        getattr(new_node, "set_key")(token.value)
+                        getattr(new_node, "set_key")(value)
 
                     # this scalar token is actually the plain value of the
                     # previous key and "a new thing" starts with the next token
@@ -692,16 +747,39 @@ class Parser:
 
         :return: the generated AST
         :raises ValueException: for any other renderer but ``jinja|yaml``
+        :raises yaml.scanner.ScannerError: if the document cannot be tokenized
+            and a loader other than :py:class:`yaml.SafeLoader` is used, as
+            the error recovery depends on the marks of the pure Python
+            scanner
         """
 
-        tokens = yaml.scan(self.document)
+        tokens = yaml.scan(self.document, Loader=self._loader)
         token = None
+        log_tokens = log.isEnabledFor(logging.DEBUG)
         try:
             for token in tokens:
-                log.debug(token)
+                if log_tokens:
+                    log.debug(token)
                 self._process_token(token)
         except yaml.scanner.ScannerError as err:
+            if self._loader is not yaml.SafeLoader:
+                raise
             log.debug(err)
+            # everything starting from the error could be an unterminated
+            # scalar
+            self._tree.multiline_scalar_lines.append(
+                (
+                    min(
+                        (
+                            mark.line
+                            for mark in (err.context_mark, err.problem_mark)
+                            if mark is not None
+                        ),
+                        default=0,
+                    ),
+                    sys.maxsize,
+                )
+            )
             if token:
                 # Properly close the opened blocks
                 for node in reversed(self._breadcrumbs):
@@ -752,8 +830,18 @@ def parse(document: str) -> Tree:
     """
     Generate the Abstract Syntax Tree for a ``jinja|yaml`` rendered SLS file.
 
+    The document is tokenized by libyaml if it is available. The pure Python
+    scanner is used for documents that do not end with a newline and for
+    documents with syntax errors, as libyaml places the end of the stream and
+    the marks of errors differently.
+
     :param document: the content of the SLS file to parse
     :return: the generated AST
     :raises ValueException: for any other renderer but ``jinja|yaml``
     """
+    if CSafeLoader is not None and document.endswith("\n"):
+        try:
+            return Parser(document, CSafeLoader).parse()
+        except yaml.scanner.ScannerError:
+            pass
     return Parser(document).parse()
@@ -5,7 +5,16 @@ Language Server Protocol implementation
 import logging
 import re
 from os.path import basename
-from typing import Dict, List, Optional, Sequence, Tuple, Union, cast
+from typing import (
+    Dict,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
 from pygls.lsp import types
 from pygls.lsp.methods import (
@@ -14,6 +23,7 @@ from pygls.lsp.methods import (
     TEXT_DOCUMENT_DID_OPEN,
     DEFINITION,
     DOCUMENT_SYMBOL,
+    SHUTDOWN,
 )
 from pygls.lsp.types import (
     CompletionItem,
@@ -44,10 +54,18 @@ class SaltServer(LanguageServer):
         super().__init__(protocol_cls=SaltLspProto)
 
         self._state_name_completions: Dict[str, StateNameCompletion] = {}
+        self._parse_cache: Optional[MutableMapping[bytes, Tree]] = None
+        self._tree_cache = True
 
         self.logger: logging.Logger = logging.getLogger()
         self._state_names: List[str] = []
 
+        #: names and documentation of the submodules of each state, see
+        #: :py:meth:`StateNameCompletion.provide_subname_completion`
+        self._subname_completions: Dict[
+            str, List[Tuple[str, Optional[str]]]
+        ] = {}
+
     @property
     def workspace(self) -> SlsFileWorkspace:
         assert isinstance(super().workspace, SlsFileWorkspace), (
@@ -60,11 +78,26 @@ class SaltServer(LanguageServer):
         self,
         state_name_completions: Dict[str, StateNameCompletion],
         log_level=logging.DEBUG,
+        parse_cache: Optional[MutableMapping[bytes, Tree]] = None,
+        tree_cache: bool = True,
     ) -> None:
         """Further initialisation, called after
-        setup_salt_server_capabilities."""
+        setup_salt_server_capabilities.
+
+        :param parse_cache: optional mapping from the SHA1 digest of a
+            document's contents to its parsed tree, which is shared by all
+            workspaces of the server
+        :param tree_cache: whether the trees of included files are persisted
+            in the workspace root, see :py:class:`salt_lsp.cache.TreeCache`
+        """
         self._state_name_completions = state_name_completions
+        self._parse_cache = parse_cache
+        self._tree_cache = tree_cache
         self._state_names = list(state_name_completions.keys())
+        self._subname_completions = {
+            state_name: completer.provide_subname_completion()
+            for state_name, completer in state_name_completions.items()
+        }
         self.logger = logging.getLogger(self.__class__.__name__)
         self.logger.setLevel(log_level)
 
@@ -93,10 +126,7 @@ class SaltServer(LanguageServer):
             )
             return []
         state_name = contents[last_match.span()[1] : ind - 1]
-        if state_name in self._state_name_completions:
-            completer = self._state_name_completions[state_name]
-            return completer.provide_subname_completion()
-        return []
+        return list(self._subname_completions.get(state_name, []))
 
     def find_id_in_doc_and_includes(
         self, id_to_find: str, starting_uri: str
@@ -167,6 +197,12 @@ def setup_salt_server_capabilities(server: SaltServer) -> None:
         server.lsp.setup_custom_workspace()
         server.logger.debug("Replaced workspace with SlsFileWorkspace")
 
+    @server.feature(SHUTDOWN)
+    def shutdown(*args) -> None:
+        """Persist the cached trees before the server exits."""
+        del args  # not needed
+        server.workspace.save_tree_cache()
+
     @server.feature(
         COMPLETION, CompletionOptions(trigger_characters=["-", "."])
     )
@@ -254,6 +290,6 @@ def setup_salt_server_capabilities(server: SaltServer) -> None:
     ) -> Optional[
         Union[List[types.DocumentSymbol], List[types.SymbolInformation]]
     ]:
-        return salt_server.workspace.document_symbols.get(
-            params.text_document.uri, []
+        return salt_server.workspace.get_document_symbols(
+            params.text_document.uri
         )
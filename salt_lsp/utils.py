@@ -4,7 +4,10 @@ Utility functions to extract data from the files
 
 from __future__ import annotations
 
+from bisect import bisect_right
+from collections import OrderedDict, deque
 from collections.abc import MutableMapping
+from functools import lru_cache
 import os
 import os.path
 import shlex
@@ -46,16 +49,23 @@ def get_git_root(path: str) -> Optional[str]:
 
 
 def get_top(path: str) -> Optional[str]:
+    """Find the directory containing the ``top.sls`` file by ascending from
+    `path`.
+
+    If no ``top.sls`` is found until the root directory is reached, then
+    `None` is returned.
+    """
     if os.path.isdir(path):
         if os.path.isfile(os.path.join(path, "top.sls")):
             return path
 
-    parent, tail = os.path.split(path)
-    if (tail == "" and parent == "/") or not parent:
-        return None
-    if os.path.isfile(os.path.join(parent, "top.sls")):
-        return parent
-    return get_top(parent)
+    while True:
+        parent, tail = os.path.split(path)
+        if (tail == "" and parent == "/") or not parent:
+            return None
+        if os.path.isfile(os.path.join(parent, "top.sls")):
+            return parent
+        path = parent
 
 
 def get_root(path: str) -> Optional[str]:
@@ -63,18 +73,29 @@ def get_root(path: str) -> Optional[str]:
     return root or get_git_root(path)
 
 
+#: translation table converting a relative path into a dotted SLS name
+_SEP_TO_DOT = str.maketrans(os.path.sep, ".")
+
+
 def get_sls_includes(path: str) -> List[str]:
-    sls_files = []
+    """Returns the dotted names of all SLS files below the root of `path`
+    which can be used in an include statement.
+    """
+    sls_files: List[str] = []
     top = get_root(path)
     if not top:
         return []
     for root, _, files in os.walk(top):
-        base = root[len(top) + 1 :].replace(os.path.sep, ".")
-        sls_files += [
-            base + (file[:-4] if file != "init.sls" else "")
-            for file in files
-            if file.endswith(".sls")
-        ]
+        base = root[len(top) + 1 :].translate(_SEP_TO_DOT)
+        prefix = f"{base}." if base else ""
+        for file in files:
+            if not file.endswith(".sls"):
+                continue
+            if file == "init.sls":
+                if base:
+                    sls_files.append(base)
+            else:
+                sls_files.append(prefix + file[:-4])
     return sls_files
 
 
@@ -82,19 +103,31 @@ def construct_path_to_position(tree: Tree, pos: Position) -> List[AstNode]:
     found_node = None
     parser_pos = parser.Position(line=pos.line, col=pos.character)
 
-    def visitor(node: AstNode) -> bool:
-        if node.start <= parser_pos and (
-            node.end is None or parser_pos <= node.end
-        ):
-            nonlocal found_node
-            found_node = node
-        return True
-
-    tree.visit(visitor)
+    # nodes are sorted by their start and deeper nodes come after their
+    # parents => the last node starting before pos that also contains it is
+    # the innermost one
+    keys, nodes = tree.nodes_by_start()
+    i = bisect_right(keys, (pos.line, pos.character, len(keys)))
+    while i > 0:
+        i -= 1
+        if (end := nodes[i].end) is None or parser_pos <= end:
+            found_node = nodes[i]
+            break
 
     if not found_node:
         return []
 
+    # A node that starts earlier but is visited later (e.g. a requisite
+    # before a parameter) also contains pos if it ends exactly where
+    # found_node starts. Prefer the node that is visited last in that case.
+    if found_node.start == parser_pos:
+        last_visited = keys[i][2]
+        for key, candidate in zip(keys[:i], nodes[:i]):
+            if key[2] > last_visited and (
+                candidate.end is None or parser_pos <= candidate.end
+            ):
+                found_node, last_visited = candidate, key[2]
+
     context: List[AstNode] = []
     node: Optional[AstNode] = found_node
     while node:
@@ -104,8 +137,16 @@ def construct_path_to_position(tree: Tree, pos: Position) -> List[AstNode]:
 
 
 def position_to_index(text: str, line: int, column: int) -> int:
-    split = text.splitlines(keepends=True)
-    return sum([len(l) for i, l in enumerate(split) if i < line]) + column
+    """Convert the (zero based) `line` and `column` into an index into
+    `text`.
+    """
+    index = 0
+    for _ in range(line):
+        newline = text.find("\n", index)
+        if newline < 0:
+            return len(text) + column
+        index = newline + 1
+    return index + column
 
 
 T = TypeVar("T")
@@ -116,12 +157,9 @@ def get_last_element_of_iterator(iterator: Iterator[T]) -> Optional[T]:
     Returns the last element of from an iterator or None if the iterator is
     empty.
     """
-    try:
-        *_, last = iterator
-        return last
-    except ValueError:
-        # empty iterator
-        return None
+    # a deque with maxlen 1 only keeps the last element in memory
+    last = deque(iterator, maxlen=1)
+    return last[0] if last else None
 
 
 #: Type for URIs
@@ -132,9 +170,14 @@ class FileUri:
     """Simple class for handling file:// URIs"""
 
     def __init__(self, uri: Union[str, Uri, FileUri]) -> None:
-        self._parse_res: ParseResult = (
-            uri._parse_res if isinstance(uri, FileUri) else urlparse(uri)
-        )
+        #: string representation of the uri, created on the first __str__ call
+        self._str: Optional[str] = None
+        if isinstance(uri, FileUri):
+            self._parse_res: ParseResult = uri._parse_res
+            self._str = uri._str
+            return
+
+        self._parse_res = urlparse(uri)
         if self._parse_res.scheme not in ("", "file"):
             raise ValueError(f"Invalid uri scheme {self._parse_res.scheme}")
         if self._parse_res.scheme == "":
@@ -145,7 +188,17 @@ class FileUri:
         return self._parse_res.path
 
     def __str__(self) -> str:
-        return self._parse_res.geturl()
+        if self._str is None:
+            self._str = self._parse_res.geturl()
+        return self._str
+
+
+@lru_cache(maxsize=4096)
+def _normalize_uri(uri: str) -> str:
+    """Convert a path or uri into the string representation of its
+    FileUri.
+    """
+    return str(FileUri(uri))
 
 
 U = Union[Uri, FileUri, str]
@@ -176,7 +229,44 @@ class UriDict(Generic[T], MutableMapping):
         return len(self._data)
 
     def _key_gen(self, key: U) -> str:
-        return str(FileUri(key))
+        if isinstance(key, FileUri):
+            return str(key)
+        return _normalize_uri(key)
+
+
+K = TypeVar("K")
+
+
+class LruDict(Generic[K, T], MutableMapping):
+    """Dictionary that stores at most `max_size` elements.
+
+    Once it is full, adding a new element removes the element that has not
+    been accessed for the longest time.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._data: OrderedDict[K, T] = OrderedDict()
+
+    def __getitem__(self, key: K) -> T:
+        value = self._data[key]
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: K, value: T) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def __delitem__(self, key: K) -> None:
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
 
 
 def is_valid_file_uri(uri: str) -> bool:
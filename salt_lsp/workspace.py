@@ -2,36 +2,38 @@
 contents utilizing the existing Workspace implementation from pygls.
 
 """
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 from logging import getLogger, Logger, DEBUG
-from pathlib import Path
-import sys
-from typing import List, Optional, Union
+import os
+from typing import Dict, List, MutableMapping, Optional, Tuple, Union
 
 from pygls.lsp import types
 from pygls.protocol import LanguageServerProtocol
-from pygls.workspace import Workspace
+from pygls.workspace import Workspace, utf16_num_units
 
 from salt_lsp.base_types import CompletionsDict, SLS_LANGUAGE_ID
+from salt_lsp.cache import TreeCache
 from salt_lsp.utils import UriDict, FileUri, get_top
 from salt_lsp.parser import parse, Tree
 from salt_lsp.document_symbols import tree_to_document_symbols
 
 
-if sys.version_info[1] <= 8:
+#: maximum number of threads reading included files concurrently
+MAX_INCLUDE_READERS = 8
 
-    def is_relative_to(p1: Path, p2: Path) -> bool:
-        # stolen from CPython's source
-        """Return True if the path is relative to another path or False."""
-        try:
-            p1.relative_to(p2)
-            return True
-        except ValueError:
-            return False
+#: characters that YAML treats as line breaks
+YAML_LINE_BREAKS = ("\n", "\r", "\x85", "\u2028", "\u2029")
 
-else:
 
-    def is_relative_to(p1: Path, p2: Path) -> bool:
-        return p1.is_relative_to(p2)
+def _read_file(path: str) -> Tuple[int, str]:
+    """Returns the modification time and the contents of the file at
+    `path`.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    with open(path, "r") as src:
+        return mtime_ns, src.read(-1)
 
 
 class SlsFileWorkspace(Workspace):
@@ -43,12 +45,21 @@ class SlsFileWorkspace(Workspace):
     """
 
     def __init__(
-        self, state_name_completions: CompletionsDict, *args, **kwargs
+        self,
+        state_name_completions: CompletionsDict,
+        *args,
+        parse_cache: Optional[MutableMapping[bytes, Tree]] = None,
+        tree_cache: bool = True,
+        **kwargs,
     ) -> None:
         #: dictionary containing the parsed contents of all tracked documents
         self._trees: UriDict[Tree] = UriDict()
 
-        #: document symbols of all tracked documents
+        #: the source code from which each tree in _trees has been parsed
+        self._sources: UriDict[str] = UriDict()
+
+        #: document symbols of the tracked documents, they are created on
+        #: demand by get_document_symbols and dropped when the tree changes
         self._document_symbols: UriDict[List[types.DocumentSymbol]] = UriDict()
 
         #: included FileUris of every tracked document
@@ -56,14 +67,27 @@ class SlsFileWorkspace(Workspace):
 
         #: top path corresponding to every workspace folder
         self._top_paths: UriDict[Optional[FileUri]] = UriDict()
+
+        #: paths of the workspace folders with a trailing slash and the
+        #: uri of the respective folder, sorted by descending path length so
+        #: that nested folders are matched first
+        self._folder_paths: List[Tuple[str, str]] = []
         self._state_name_completions = state_name_completions
 
+        #: trees indexed by the SHA1 digest of their source, can be shared
+        #: with other workspaces
+        self._parse_cache = parse_cache
+
         self.logger: Logger = getLogger(self.__class__.__name__)
         # FIXME: make this configurable
         self.logger.setLevel(DEBUG)
 
         super().__init__(*args, **kwargs)
 
+        #: on disk cache of the trees of included files, it is disabled if
+        #: `tree_cache` is False
+        self._tree_cache = TreeCache(self.root_path if tree_cache else None)
+
     @property
     def trees(self) -> UriDict[Tree]:
         """A dictionary which contains the parsed :ref:`Tree` for each document
@@ -71,16 +95,99 @@ class SlsFileWorkspace(Workspace):
         """
         return self._trees
 
-    @property
-    def document_symbols(self) -> UriDict[List[types.DocumentSymbol]]:
-        """The document symbols of each SLS files in the workspace."""
-        return self._document_symbols
+    def get_document_symbols(
+        self, uri: Union[str, FileUri]
+    ) -> List[types.DocumentSymbol]:
+        """Returns the document symbols of the SLS file with the given uri.
+
+        The symbols are created on the first call and cached until the
+        document changes. An empty list is returned for unknown documents.
+        """
+        if (symbols := self._document_symbols.get(uri)) is not None:
+            return symbols
+        if (tree := self._trees.get(uri)) is None:
+            return []
+
+        symbols = tree_to_document_symbols(tree, self._state_name_completions)
+        self._document_symbols[uri] = symbols
+        return symbols
 
     @property
     def includes(self) -> UriDict[List[FileUri]]:
         """The list of includes of each SLS file in the workspace."""
         return self._includes
 
+    def _parse(self, source: str) -> Tree:
+        """Parse `source`, reusing the tree from the parse cache if present."""
+        if self._parse_cache is None:
+            return parse(source)
+
+        digest = hashlib.sha1(source.encode("utf-8")).digest()
+        if (tree := self._parse_cache.get(digest)) is None:
+            tree = parse(source)
+            self._parse_cache[digest] = tree
+        return tree
+
+    def _get_direct_includes(
+        self,
+        text_document_uri: Union[str, FileUri],
+        top_path: str,
+        memo: Optional[Dict[str, List[FileUri]]] = None,
+    ) -> List[FileUri]:
+        """Returns the files that are directly included by the document with
+        the given uri.
+
+        :param top_path: the path to the top states folder
+        :param memo: dictionary storing the result for each uri, so that the
+            includes of a document are only looked up once on the file system
+        """
+        key = str(FileUri(text_document_uri))
+        if memo is not None and (includes := memo.get(key)) is not None:
+            return includes
+
+        if (
+            tree := self._trees.get(text_document_uri)
+        ) is None or tree.includes is None:
+            includes = []
+        else:
+            includes = [
+                FileUri(f)
+                for incl in tree.includes.includes
+                if (f := incl.get_file(top_path)) is not None
+            ]
+
+        if memo is not None:
+            memo[key] = includes
+        return includes
+
+    def _get_all_includes(
+        self,
+        text_document_uri: Union[str, FileUri],
+        top_path: str,
+        memo: Optional[Dict[str, List[FileUri]]] = None,
+    ) -> List[FileUri]:
+        """Returns all files that are included by the document with the given
+        uri directly or indirectly, in breadth first order and without
+        duplicates.
+
+        :param memo: see :py:meth:`_get_direct_includes`
+        """
+        seen = {str(FileUri(text_document_uri))}
+        all_includes: List[FileUri] = []
+        pending = deque(
+            self._get_direct_includes(text_document_uri, top_path, memo)
+        )
+
+        while pending:
+            inc = pending.popleft()
+            if str(inc) in seen:
+                continue
+            seen.add(str(inc))
+            all_includes.append(inc)
+            pending.extend(self._get_direct_includes(inc, top_path, memo))
+
+        return all_includes
+
     def _resolve_includes(
         self, text_document_uri: Union[str, FileUri]
     ) -> None:
@@ -92,48 +199,82 @@ class SlsFileWorkspace(Workspace):
             return
 
         ws_folder = self._get_workspace_of_document(text_document_uri)
-        if (
-            ws_folder in self._top_paths
-            and self._top_paths[ws_folder] is not None
-        ):
-            top_path = self._top_paths[ws_folder]
-        else:
-            top_path = ws_folder
-
-        assert top_path is not None
+        top_uri: Union[str, FileUri] = (
+            self._top_paths.get(ws_folder) or ws_folder
+        )
+        top_path = FileUri(top_uri).path
 
-        self._includes[text_document_uri] = [
-            FileUri(f)
-            for incl in tree.includes.includes
-            if (f := incl.get_file(FileUri(top_path).path)) is not None
-        ]
+        # the trees do not change while the includes are resolved => the
+        # include paths of every document only need to be looked up once
+        memo: Dict[str, List[FileUri]] = {}
 
-        new_includes = self._includes[text_document_uri]
-
-        # now try to re-read all the trees if they are not present:
-        for inc in self._includes[text_document_uri]:
-            if inc not in self._trees:
-                self.logger.debug(
-                    "Adding file '%s' via includes of '%s'",
-                    inc,
-                    text_document_uri,
-                )
-                with open(inc.path, "r") as inc_file:
-                    self.put_document(
-                        types.TextDocumentItem(
-                            uri=str(inc),
-                            language_id=SLS_LANGUAGE_ID,
-                            version=0,
-                            text=inc_file.read(-1),
+        # read all (indirectly) included files that are not yet present level
+        # by level, the files of each level are read concurrently
+        added: List[FileUri] = []
+        pending = self._get_missing_files(
+            self._get_direct_includes(text_document_uri, top_path, memo)
+        )
+        if pending:
+            with ThreadPoolExecutor(
+                max_workers=MAX_INCLUDE_READERS
+            ) as executor:
+                while pending:
+                    next_level: List[FileUri] = []
+                    for inc, (mtime_ns, text) in zip(
+                        pending,
+                        executor.map(
+                            _read_file, [inc.path for inc in pending]
+                        ),
+                    ):
+                        self.logger.debug(
+                            "Adding file '%s' via includes of '%s'",
+                            inc,
+                            text_document_uri,
+                        )
+                        self._put_included_document(inc, mtime_ns, text)
+                        added.append(inc)
+                        next_level += self._get_direct_includes(
+                            inc, top_path, memo
                         )
-                    )
-                self._resolve_includes(inc)
 
-            if inc in self._trees and self._includes.get(inc):
-                new_includes += self._includes[inc]
+                    pending = self._get_missing_files(next_level)
+
+        for uri in [text_document_uri, *added]:
+            self._includes[uri] = self._get_all_includes(uri, top_path, memo)
+
+    def _get_missing_files(self, uris: List[FileUri]) -> List[FileUri]:
+        """Returns the uris which have no tree yet without duplicates."""
+        missing: Dict[str, FileUri] = {}
+        for uri in uris:
+            if uri not in self._trees:
+                missing.setdefault(str(uri), uri)
+        return list(missing.values())
+
+    def _put_included_document(
+        self, uri: FileUri, mtime_ns: int, text: str
+    ) -> None:
+        """Add the included file at `uri` with the contents `text` to the
+        workspace, reusing its tree from the on disk cache if the file has not
+        been modified since.
+
+        The includes of the file are not resolved.
+        """
+        text_document = types.TextDocumentItem(
+            uri=str(uri),
+            language_id=SLS_LANGUAGE_ID,
+            version=0,
+            text=text,
+        )
+        super().put_document(text_document)
+
+        if (tree := self._tree_cache.get(uri.path, mtime_ns)) is None:
+            tree = self._parse(text)
+            self._tree_cache.put(uri.path, mtime_ns, tree)
+        self._set_tree(uri, tree, text)
 
-        assert len(new_includes) >= len(self._includes[text_document_uri])
-        self._includes[text_document_uri] = new_includes
+    def save_tree_cache(self) -> None:
+        """Persist the trees of the included files on disk."""
+        self._tree_cache.save()
 
     def _update_document(
         self,
@@ -143,48 +284,126 @@ class SlsFileWorkspace(Workspace):
     ) -> None:
         self.logger.debug("updating document '%s'", text_document.uri)
         uri = text_document.uri
-        tree = parse(self.get_document(uri).source)
-        self._trees[uri] = tree
-
-        self._document_symbols[uri] = tree_to_document_symbols(
-            tree, self._state_name_completions
-        )
-
+        source = self.get_document(uri).source
+        if uri in self._trees and self._sources.get(uri) == source:
+            tree = self._trees[uri]
+        else:
+            tree = self._parse(source)
+        self._set_tree(uri, tree, source)
         self._resolve_includes(text_document.uri)
 
-    def _get_workspace_of_document(self, uri: Union[str, FileUri]) -> FileUri:
-        for workspace_uri in self._folders:
+    def _set_tree(
+        self, uri: Union[str, FileUri], tree: Tree, source: str
+    ) -> None:
+        self._sources[uri] = source
+        if self._trees.get(uri) is tree:
+            # the tree is unchanged and so are its document symbols
+            return
 
-            if is_relative_to(
-                Path(FileUri(uri).path), Path(FileUri(workspace_uri).path)
-            ):
+        self._trees[uri] = tree
+        self._document_symbols.pop(uri, None)
+
+    def _get_workspace_of_document(self, uri: Union[str, FileUri]) -> str:
+        path = FileUri(uri).path
+        for folder_path, workspace_uri in self._folder_paths:
+            if path.startswith(folder_path) or path == folder_path[:-1]:
                 return workspace_uri
 
         return self.root_uri
 
     def add_folder(self, folder: types.WorkspaceFolder) -> None:
         super().add_folder(folder)
-        top_path = get_top(FileUri(folder.uri).path)
+        folder_path = FileUri(folder.uri).path
+        top_path = get_top(folder_path)
         self._top_paths[FileUri(folder.uri)] = (
             FileUri(top_path) if top_path is not None else None
         )
 
+        if folder_path:
+            self._folder_paths.append(
+                (folder_path.rstrip("/") + "/", folder.uri)
+            )
+            self._folder_paths.sort(key=lambda entry: -len(entry[0]))
+
     def remove_folder(self, folder_uri: Union[str, FileUri]) -> None:
         super().remove_folder(str(folder_uri))
         self._top_paths.pop(FileUri(folder_uri))
+        self._folder_paths = [
+            (folder_path, workspace_uri)
+            for folder_path, workspace_uri in self._folder_paths
+            if str(FileUri(workspace_uri)) != str(FileUri(folder_uri))
+        ]
 
     def update_document(
         self,
         text_document: types.VersionedTextDocumentIdentifier,
         change: types.TextDocumentContentChangeEvent,
     ) -> None:
+        keeps_tree = self._change_only_edits_comment(text_document.uri, change)
         super().update_document(text_document, change)
+        if keeps_tree:
+            self._sources[text_document.uri] = self.get_document(
+                text_document.uri
+            ).source
+            return
         self._update_document(text_document)
 
+    def _change_only_edits_comment(
+        self,
+        uri: str,
+        change: types.TextDocumentContentChangeEvent,
+    ) -> bool:
+        """Returns True if the (not yet applied) incremental `change` only
+        modifies the text of a comment that fills a whole line.
+
+        Comments are dropped by the parser, so such a change does not modify
+        the tree of the document.
+        """
+        # pygls replaces the whole document if the changes are not synced
+        # incrementally, even if the change has a range
+        if self._sync_kind != types.TextDocumentSyncKind.INCREMENTAL:
+            return False
+        if (
+            change_range := getattr(change, "range", None)
+        ) is None or change_range.start.line != change_range.end.line:
+            return False
+        if any(line_break in change.text for line_break in YAML_LINE_BREAKS):
+            return False
+        if (tree := self._trees.get(uri)) is None:
+            return False
+
+        line_no = change_range.start.line
+        lines = self.get_document(uri).lines
+        # The end of the stream is placed after the last character if the
+        # document does not end with a newline => it would move
+        if line_no >= len(lines) or not lines[line_no].endswith("\n"):
+            return False
+        # pygls does not clamp the end of the range to the end of the line, a
+        # change ending after the last character would remove the line break
+        if change_range.end.character > utf16_num_units(
+            lines[line_no].rstrip("\r\n")
+        ):
+            return False
+
+        stripped = lines[line_no].lstrip()
+        comment_start = len(lines[line_no]) - len(stripped)
+        if (
+            not stripped.startswith("#")
+            or change_range.start.character <= comment_start
+        ):
+            return False
+
+        # a '#' in a block or quoted scalar is not a comment
+        return not any(
+            first <= line_no <= last
+            for first, last in tree.multiline_scalar_lines
+        )
+
     def remove_document(self, doc_uri: str) -> None:
         super().remove_document(doc_uri)
-        self._document_symbols.pop(FileUri(doc_uri))
+        self._document_symbols.pop(FileUri(doc_uri), None)
         self._trees.pop(FileUri(doc_uri))
+        self._sources.pop(FileUri(doc_uri), None)
 
     def put_document(self, text_document: types.TextDocumentItem) -> None:
         super().put_document(text_document)
@@ -211,4 +430,6 @@ class SaltLspProto(LanguageServerProtocol):
                 old_ws.root_uri,
                 self._server.sync_kind,
                 old_ws.folders.values(),
+                parse_cache=self._server._parse_cache,
+                tree_cache=self._server._tree_cache,
             )
@@ -1,6 +1,15 @@
-import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import count
+from pathlib import Path
+from queue import Queue
 from threading import Thread
-import os
+from types import MappingProxyType
+from typing import Any, Dict, IO, Iterator, Optional, Tuple
+import json
+import re
+import socket
+import sys
 
 from pygls.lsp.methods import (
     EXIT,
@@ -14,49 +23,71 @@ from pygls.lsp.types import (
     DidOpenTextDocumentParams,
     TextDocumentItem,
 )
-from pygls.server import LanguageServer
+from pygls.lsp.types.basic_structures import (
+    JsonRPCNotification,
+    JsonRPCRequestMessage,
+)
+from pygls.protocol import JsonRPCProtocol, default_serializer
 import pytest
 
 from salt_lsp.base_types import StateNameCompletion
 from salt_lsp.server import SaltServer, setup_salt_server_capabilities
 
 
-MODULE_DOCS = {
-    "file": "doc of file",
-    "file.absent": "Make sure that the named file or directory is absent. If it exists, it will\nbe deleted. This will work to reverse any of the functions in the file\nstate module. If a directory is supplied, it will be recursively deleted.\n\nname\n    The path which should be deleted",
-    "file.accumulated": "file accumulated docs",
-    "file.append": "file append details",
-    "file.blockreplace": "",
-    "file.cached": "",
-    "file.comment": "",
-    "file.copy": "",
-    "file.decode": "",
-    "file.directory": "",
-    "file.exists": "Verify that the named file or directory is present or exists.\nEnsures pre-requisites outside of Salt's purview\n(e.g., keytabs, private keys, etc.) have been previously satisfied before\ndeployment.\n\nThis function does not create the file if it doesn't exist, it will return\nan error.\n\nname\n    Absolute path which must exist",
-    "file.hardlink": "",
-    "file.keyvalue": "",
-    "file.line": "",
-    "file.managed": "",
-    "file.missing": "Verify that the named file or directory is missing, this returns True only\nif the named file is missing but does not remove the file if it is present.\n\nname\n    Absolute path which must NOT exist",
-    "file.mknod": "",
-    "file.mod_run_check_cmd": "Execute the check_cmd logic.\n\nReturn a result dict if ``check_cmd`` succeeds (check_cmd == 0)\notherwise return True",
-    "file.not_cached": "",
-    "file.patch": "",
-    "file.prepend": "",
-    "file.recurse": "",
-    "file.rename": 'If the source file exists on the system, rename it to the named file. The\nnamed file will not be overwritten if it already exists unless the force\noption is set to True.\n\nname\n    The location of the file to rename to\n\nsource\n    The location of the file to move to the location specified with name\n\nforce\n    If the target location is present then the file will not be moved,\n    specify "force: True" to overwrite the target file\n\nmakedirs\n    If the target subdirectories don\'t exist create them',
-    "file.replace": "",
-    "file.retention_schedule": "",
-    "file.serialize": "",
-    "file.shortcut": "",
-    "file.symlink": "Just a dummy documentation of file.symlink",
-    "file.tidied": "",
-    "file.touch": "",
-    "file.uncomment": "",
-}
+def _freeze(value: Any) -> Any:
+    """Convert the nested dicts and lists of `value` into read only mappings
+    and tuples and intern all strings, so that the data shared by all tests
+    cannot be modified by one of them.
+    """
+    if isinstance(value, dict):
+        return MappingProxyType(
+            {_freeze(key): _freeze(val) for key, val in value.items()}
+        )
+    if isinstance(value, list):
+        return tuple(_freeze(elem) for elem in value)
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+MODULE_DOCS = _freeze(
+    {
+        "file": "doc of file",
+        "file.absent": "Make sure that the named file or directory is absent. If it exists, it will\nbe deleted. This will work to reverse any of the functions in the file\nstate module. If a directory is supplied, it will be recursively deleted.\n\nname\n    The path which should be deleted",
+        "file.accumulated": "file accumulated docs",
+        "file.append": "file append details",
+        "file.blockreplace": "",
+        "file.cached": "",
+        "file.comment": "",
+        "file.copy": "",
+        "file.decode": "",
+        "file.directory": "",
+        "file.exists": "Verify that the named file or directory is present or exists.\nEnsures pre-requisites outside of Salt's purview\n(e.g., keytabs, private keys, etc.) have been previously satisfied before\ndeployment.\n\nThis function does not create the file if it doesn't exist, it will return\nan error.\n\nname\n    Absolute path which must exist",
+        "file.hardlink": "",
+        "file.keyvalue": "",
+        "file.line": "",
+        "file.managed": "",
+        "file.missing": "Verify that the named file or directory is missing, this returns True only\nif the named file is missing but does not remove the file if it is present.\n\nname\n    Absolute path which must NOT exist",
+        "file.mknod": "",
+        "file.mod_run_check_cmd": "Execute the check_cmd logic.\n\nReturn a result dict if ``check_cmd`` succeeds (check_cmd == 0)\notherwise return True",
+        "file.not_cached": "",
+        "file.patch": "",
+        "file.prepend": "",
+        "file.recurse": "",
+        "file.rename": 'If the source file exists on the system, rename it to the named file. The\nnamed file will not be overwritten if it already exists unless the force\noption is set to True.\n\nname\n    The location of the file to rename to\n\nsource\n    The location of the file to move to the location specified with name\n\nforce\n    If the target location is present then the file will not be moved,\n    specify "force: True" to overwrite the target file\n\nmakedirs\n    If the target subdirectories don\'t exist create them',
+        "file.replace": "",
+        "file.retention_schedule": "",
+        "file.serialize": "",
+        "file.shortcut": "",
+        "file.symlink": "Just a dummy documentation of file.symlink",
+        "file.tidied": "",
+        "file.touch": "",
+        "file.uncomment": "",
+    }
+)
 
 
-FILE_PARAMS = [
+FILE_PARAMS = _freeze(
     {
         "hardlink": {
             "name": None,
@@ -67,9 +98,7 @@ FILE_PARAMS = [
             "group": None,
             "dir_mode": None,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "symlink": {
             "name": None,
             "target": None,
@@ -84,10 +113,8 @@ FILE_PARAMS = [
             "win_deny_perms": None,
             "win_inheritance": None,
             "kwargs": "kwargs",
-        }
-    },
-    {"absent": {"name": None, "kwargs": "kwargs"}},
-    {
+        },
+        "absent": {"name": None, "kwargs": "kwargs"},
         "tidied": {
             "name": None,
             "age": 0,
@@ -95,11 +122,9 @@ FILE_PARAMS = [
             "rmdirs": False,
             "size": 0,
             "kwargs": "kwargs",
-        }
-    },
-    {"exists": {"name": None, "kwargs": "kwargs"}},
-    {"missing": {"name": None, "kwargs": "kwargs"}},
-    {
+        },
+        "exists": {"name": None, "kwargs": "kwargs"},
+        "missing": {"name": None, "kwargs": "kwargs"},
         "managed": {
             "name": None,
             "source": None,
@@ -140,9 +165,7 @@ FILE_PARAMS = [
             "win_perms_reset": False,
             "verify_ssl": True,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "directory": {
             "name": None,
             "user": None,
@@ -166,9 +189,7 @@ FILE_PARAMS = [
             "win_inheritance": True,
             "win_perms_reset": False,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "recurse": {
             "name": None,
             "source": None,
@@ -196,17 +217,13 @@ FILE_PARAMS = [
             "win_deny_perms": None,
             "win_inheritance": True,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "retention_schedule": {
             "name": None,
             "retain": None,
             "strptime_format": None,
             "timezone": None,
-        }
-    },
-    {
+        },
         "line": {
             "name": None,
             "content": None,
@@ -223,9 +240,7 @@ FILE_PARAMS = [
             "user": None,
             "group": None,
             "file_mode": None,
-        }
-    },
-    {
+        },
         "replace": {
             "name": None,
             "pattern": None,
@@ -240,9 +255,7 @@ FILE_PARAMS = [
             "show_changes": True,
             "ignore_if_missing": False,
             "backslash_literal": False,
-        }
-    },
-    {
+        },
         "keyvalue": {
             "name": None,
             "key": None,
@@ -258,9 +271,7 @@ FILE_PARAMS = [
             "uncomment": None,
             "key_ignore_case": False,
             "value_ignore_case": False,
-        }
-    },
-    {
+        },
         "blockreplace": {
             "name": None,
             "marker_start": "#-- start managed zone --",
@@ -280,25 +291,19 @@ FILE_PARAMS = [
             "append_newline": None,
             "insert_before_match": None,
             "insert_after_match": None,
-        }
-    },
-    {
+        },
         "comment": {
             "name": None,
             "regex": None,
             "char": "#",
             "backup": ".bak",
-        }
-    },
-    {
+        },
         "uncomment": {
             "name": None,
             "regex": None,
             "char": "#",
             "backup": ".bak",
-        }
-    },
-    {
+        },
         "append": {
             "name": None,
             "text": None,
@@ -311,9 +316,7 @@ FILE_PARAMS = [
             "defaults": None,
             "context": None,
             "ignore_whitespace": True,
-        }
-    },
-    {
+        },
         "prepend": {
             "name": None,
             "text": None,
@@ -326,9 +329,7 @@ FILE_PARAMS = [
             "defaults": None,
             "context": None,
             "header": None,
-        }
-    },
-    {
+        },
         "patch": {
             "name": None,
             "source": None,
@@ -343,17 +344,13 @@ FILE_PARAMS = [
             "strip": None,
             "saltenv": None,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "touch": {
             "name": None,
             "atime": None,
             "mtime": None,
             "makedirs": False,
-        }
-    },
-    {
+        },
         "copy": {
             "name": None,
             "source": None,
@@ -365,26 +362,20 @@ FILE_PARAMS = [
             "mode": None,
             "subdir": False,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "rename": {
             "name": None,
             "source": None,
             "force": False,
             "makedirs": False,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "accumulated": {
             "name": None,
             "filename": None,
             "text": None,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "serialize": {
             "name": None,
             "dataset": None,
@@ -403,9 +394,7 @@ FILE_PARAMS = [
             "serializer_opts": None,
             "deserializer_opts": None,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "mknod": {
             "name": None,
             "ntype": None,
@@ -414,25 +403,19 @@ FILE_PARAMS = [
             "user": None,
             "group": None,
             "mode": "0600",
-        }
-    },
-    {
+        },
         "mod_run_check_cmd": {
             "cmd": None,
             "filename": None,
             "kwargs": "check_cmd_opts",
-        }
-    },
-    {
+        },
         "decode": {
             "name": None,
             "encoded_data": None,
             "contents_pillar": None,
             "encoding_type": "base64",
             "checksum": "md5",
-        }
-    },
-    {
+        },
         "shortcut": {
             "name": None,
             "target": None,
@@ -445,19 +428,17 @@ FILE_PARAMS = [
             "makedirs": False,
             "user": None,
             "kwargs": "kwargs",
-        }
-    },
-    {
+        },
         "cached": {
             "name": None,
             "source_hash": "",
             "source_hash_name": None,
             "skip_verify": False,
             "saltenv": "base",
-        }
-    },
-    {"not_cached": {"name": None, "saltenv": "base"}},
-]
+        },
+        "not_cached": {"name": None, "saltenv": "base"},
+    }
+)
 
 
 FILE_NAME_COMPLETER = {
@@ -471,100 +452,224 @@ FILE_NAME_COMPLETER = {
 
 CALL_TIMEOUT = 5
 
+#: buffer size of the socket files of the client and the server, large enough
+#: to read most messages with a single recv call
+IO_BUFFER_SIZE = 64 * 1024
 
-@pytest.fixture
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--skipslow",
+        action="store_true",
+        default=False,
+        help="skip the slow tests which need a running language server",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "slow: test needs a running language server"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Mark all tests using the language server as slow and skip them if
+    --skipslow is passed.
+    """
+    skip_slow = pytest.mark.skip(reason="--skipslow has been passed")
+    for item in items:
+        if "salt_client_server" not in item.fixturenames:
+            continue
+        item.add_marker(pytest.mark.slow)
+        if config.getoption("--skipslow"):
+            item.add_marker(skip_slow)
+
+
+@pytest.fixture(scope="session")
 def file_name_completer():
-    return {
-        "file": StateNameCompletion(
-            "file",
-            FILE_PARAMS,
-            MODULE_DOCS,
+    return FILE_NAME_COMPLETER
+
+
+class SyncLspClient:
+    """Minimal synchronous language server client that sends framed JSON-RPC
+    messages over a socket and waits for the responses.
+
+    A reader thread collects the responses of the server and drops all other
+    messages (notifications or requests from the server).
+    """
+
+    _CONTENT_LENGTH = re.compile(rb"^Content-Length: (\d+)\r\n$")
+
+    def __init__(self, sock: socket.socket) -> None:
+        self._rfile: IO[bytes] = sock.makefile("rb", buffering=IO_BUFFER_SIZE)
+        self._wfile: IO[bytes] = sock.makefile("wb", buffering=IO_BUFFER_SIZE)
+        self._ids = count()
+        self._responses: "Queue[Optional[Dict[str, Any]]]" = Queue()
+        self._reader = Thread(target=self._read_messages, daemon=True)
+        self._reader.start()
+
+    def _read_messages(self) -> None:
+        content_length = 0
+        while header := self._rfile.readline():
+            if match := self._CONTENT_LENGTH.fullmatch(header):
+                content_length = int(match.group(1))
+            elif header == b"\r\n" and content_length:
+                message = json.loads(self._rfile.read(content_length))
+                content_length = 0
+                if "method" not in message:
+                    self._responses.put(message)
+
+        # wake up a request that is still waiting
+        self._responses.put(None)
+
+    def _send(self, message: Any) -> None:
+        body = message.json(
+            by_alias=True, exclude_unset=True, encoder=default_serializer
+        ).encode("utf-8")
+        self._wfile.write(
+            f"Content-Length: {len(body)}\r\n\r\n".encode("utf-8") + body
+        )
+        self._wfile.flush()
+
+    def send_request(
+        self, method: str, params: Any = None, timeout: float = CALL_TIMEOUT
+    ) -> Any:
+        """Send the request `method` to the server and return the result of
+        the server's response.
+        """
+        msg_id = next(self._ids)
+        self._send(
+            JsonRPCRequestMessage(
+                id=msg_id,
+                jsonrpc=JsonRPCProtocol.VERSION,
+                method=method,
+                params=params,
+            )
         )
-    }
 
+        while (response := self._responses.get(timeout=timeout)) is not None:
+            if response.get("id") != msg_id:
+                continue
+            if "error" in response:
+                raise RuntimeError(
+                    f"{method} request failed: {response['error']}"
+                )
+            return response.get("result")
 
-@pytest.fixture
-def salt_client_server():
-    scr, scw = os.pipe()
-    csr, csw = os.pipe()
+        raise ConnectionError("The server closed the connection")
+
+    def notify(self, method: str, params: Any = None) -> None:
+        """Send the notification `method` to the server."""
+        self._send(
+            JsonRPCNotification(
+                jsonrpc=JsonRPCProtocol.VERSION, method=method, params=params
+            )
+        )
+
+    def close(self) -> None:
+        """Wait for the server to close the connection and stop reading."""
+        self._reader.join()
+        self._rfile.close()
+        self._wfile.close()
+
+
+@pytest.fixture(scope="session")
+def parse_cache():
+    """Trees of the parsed documents shared by all servers of the session."""
+    return {}
+
+
+@pytest.fixture(scope="session")
+def _server_executor():
+    """Executor running the language servers, so that its thread is reused by
+    the servers of all test modules.
+    """
+    with ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="salt-lsp-server"
+    ) as executor:
+        yield executor
+
+
+@contextmanager
+def run_salt_server(
+    executor: Executor,
+    parse_cache: Optional[Dict[bytes, Any]] = None,
+    tree_cache: bool = False,
+) -> Iterator[Tuple[SyncLspClient, SaltServer]]:
+    """Start a language server in `executor` and yield it together with a
+    client that is connected to it. The server is shut down on exit.
+
+    :param tree_cache: whether the server persists the trees of included
+        files in the workspace root on shutdown, it is disabled by default so
+        that the tests do not write into shared workspaces
+    """
+    server_sock, client_sock = socket.socketpair()
 
     server = SaltServer()
     setup_salt_server_capabilities(server)
-    server.post_init(FILE_NAME_COMPLETER)
-
-    server_thread = Thread(
-        target=server.start_io,
-        args=(os.fdopen(csr, "rb"), os.fdopen(scw, "wb")),
-    )
-    server_thread.daemon = True
-    client = LanguageServer(asyncio.new_event_loop())
-    client_thread = Thread(
-        target=client.start_io,
-        args=(os.fdopen(scr, "rb"), os.fdopen(csw, "wb")),
+    server.post_init(
+        FILE_NAME_COMPLETER, parse_cache=parse_cache, tree_cache=tree_cache
     )
-    client_thread.daemon = True
 
-    server_thread.start()
-    server.thread_id = server_thread.ident
+    server_future = executor.submit(
+        server.start_io,
+        server_sock.makefile("rb", buffering=IO_BUFFER_SIZE),
+        server_sock.makefile("wb", buffering=IO_BUFFER_SIZE),
+    )
 
-    client_thread.start()
+    client = SyncLspClient(client_sock)
 
-    response = client.lsp.send_request(
-        INITIALIZE,
-        InitializeParams(
-            process_id=12345,
-            root_uri="file://",
-            capabilities=ClientCapabilities(),
-        ),
-    ).result(timeout=CALL_TIMEOUT)
+    response = open_workspace(client, "file://")
 
     assert "capabilities" in response
 
     yield client, server
 
-    shutdown_response = client.lsp.send_request(SHUTDOWN).result(
-        timeout=CALL_TIMEOUT
-    )
-    assert shutdown_response is None
+    assert client.send_request(SHUTDOWN) is None
 
     # exit the server
-    client.lsp.notify(EXIT)
-    server_thread.join()
-
-    # exit the client
-    client._stop_event.set()
-    try:
-        client.loop._signal_handlers.clear()  # HACK ?
-    except AttributeError:
-        pass
-    client_thread.join()
-
-
-@pytest.fixture()
-def sample_workspace(tmp_path):
-    with open(tmp_path / "top.sls", "w") as topfile:
-        topfile.write(
-            """base:
+    client.notify(EXIT)
+    server_future.result(timeout=CALL_TIMEOUT)
+
+    # the client stops reading once the server's end of the socket is closed
+    server_sock.shutdown(socket.SHUT_RDWR)
+    client.close()
+
+    server_sock.close()
+    client_sock.close()
+
+
+@pytest.fixture(scope="module")
+def _module_salt_client_server(parse_cache, _server_executor):
+    with run_salt_server(_server_executor, parse_cache) as client_server:
+        yield client_server
+
+
+@pytest.fixture
+def salt_client_server(_module_salt_client_server):
+    """Client and server that are shared by all tests of a module, the server
+    is reinitialized before each test so that it starts with an empty
+    workspace.
+    """
+    client, server = _module_salt_client_server
+    open_workspace(client, "file://", request_timeout=CALL_TIMEOUT)
+    yield client, server
+
+
+#: files of the sample workspace, the include statements are from:
+#: https://docs.saltproject.io/en/latest/ref/states/compiler_ordering.html#the-include-statement
+SAMPLE_WORKSPACE_FILES = {
+    "top.sls": """base:
   '*':
     - opensuse
-"""
-        )
-
-    opensuse = tmp_path / "opensuse"
-    (tmp_path / "opensuse").mkdir(parents=True)
-    with open(opensuse / "init.sls", "w") as initfile:
-        initfile.write(
-            """include:
+""",
+    "opensuse/init.sls": """include:
   - dns.server
 
 root:
   user.present
-"""
-        )
-
-    with open(opensuse / "base.sls", "w") as base_sls:
-        base_sls.write(
-            """bernd:
+""",
+    "opensuse/base.sls": """bernd:
   user.present:
     - fullname: Bernhardt
     - home: /home/bernd
@@ -574,81 +679,78 @@ root:
     - source: salt://opensuse/bash
     - require:
       - user: bernd
-"""
-        )
-
-    dns_server = tmp_path / "dns" / "server"
-    dns_server.mkdir(parents=True)
-
-    with open(dns_server / "init.sls", "w") as initfile:
-        initfile.write(
-            """/disk:
+""",
+    "dns/server/init.sls": """/disk:
   mount.mounted:
     - fstype: zfs
-"""
-        )
-
-    # from:
-    # https://docs.saltproject.io/en/latest/ref/states/compiler_ordering.html#the-include-statement
-    with open(tmp_path / "foo.sls", "w") as foo_sls:
-        foo_sls.write(
-            """include:
+""",
+    "foo.sls": """include:
   - bar
   - baz
-"""
-        )
-    with open(tmp_path / "bar.sls", "w") as bar_sls:
-        bar_sls.write(
-            """include:
+""",
+    "bar.sls": """include:
   - quo
-"""
-        )
-    with open(tmp_path / "baz.sls", "w") as baz_sls:
-        baz_sls.write(
-            """include:
+""",
+    "baz.sls": """include:
   - qux
-"""
-        )
-
-    with open(tmp_path / "quo.sls", "w") as quo_file:
-        quo_file.write(
-            """/root/.fishrc:
+""",
+    "quo.sls": """/root/.fishrc:
   file.managed:
     - user: root
     - group: root
     - require:
       - user: root
-"""
-        )
+""",
+}
+
+
+@pytest.fixture(scope="session")
+def sample_workspace(tmp_path_factory):
+    """Directory with the files from SAMPLE_WORKSPACE_FILES.
+
+    It is shared by all tests and must therefore not be modified.
+    """
+    tmp_path = tmp_path_factory.mktemp("sample_workspace")
+    for rel_path, contents in SAMPLE_WORKSPACE_FILES.items():
+        dest = tmp_path / rel_path
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(contents.encode("utf-8"))
 
     yield tmp_path
 
 
+#: parameters of the INITIALIZE request, only the root_uri is changed for
+#: each workspace
+_INITIALIZE_PARAMS = InitializeParams(
+    process_id=12345, root_uri="file://", capabilities=ClientCapabilities()
+)
+
+
 def open_workspace(
-    client: LanguageServer, root_uri: str, request_timeout: int = 5
-) -> None:
-    client.lsp.send_request(
+    client: SyncLspClient, root_uri: str, request_timeout: int = 5
+) -> Dict[str, Any]:
+    """(Re-)initialize the server with the workspace at `root_uri` and return
+    the result of the INITIALIZE request.
+    """
+    return client.send_request(
         INITIALIZE,
-        InitializeParams(
-            process_id=12345,
-            root_uri=root_uri,
-            capabilities=ClientCapabilities(),
-        ),
-    ).result(timeout=request_timeout)
+        _INITIALIZE_PARAMS.copy(update={"root_uri": root_uri}),
+        timeout=request_timeout,
+    )
 
 
 def open_file(
-    client: LanguageServer, file_path: str, request_timeout: int = 5
+    client: SyncLspClient, file_path: str, request_timeout: int = 5
 ) -> None:
-    with open(file_path) as base_sls:
-        client.lsp.send_request(
-            TEXT_DOCUMENT_DID_OPEN,
-            DidOpenTextDocumentParams(
-                text_document=TextDocumentItem(
-                    uri="file://" + file_path,
-                    language_id="sls",
-                    version=0,
-                    text=base_sls.read(-1),
-                )
-            ),
-        ).result(timeout=request_timeout)
+    client.send_request(
+        TEXT_DOCUMENT_DID_OPEN,
+        DidOpenTextDocumentParams(
+            text_document=TextDocumentItem(
+                uri=f"file://{file_path}",
+                language_id="sls",
+                version=0,
+                text=Path(file_path).read_text(encoding="utf-8"),
+            )
+        ),
+        timeout=request_timeout,
+    )
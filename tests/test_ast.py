@@ -1,6 +1,25 @@
+from functools import lru_cache
+
+import pytest
 import yaml
 
-from salt_lsp.parser import *
+from salt_lsp.parser import (
+    AstNode,
+    CSafeLoader,
+    ExtendNode,
+    IncludeNode,
+    IncludesNode,
+    Parser,
+    Position,
+    RequisiteNode,
+    RequisitesNode,
+    StateCallNode,
+    StateNode,
+    StateParameterNode,
+    TokenNode,
+    Tree,
+    parse,
+)
 from typing import Callable
 
 
@@ -206,12 +225,18 @@ def test_requisites():
     )
 
 
+@lru_cache(maxsize=None)
+def _buffer(content):
+    return f"{content}\x00"
+
+
+@lru_cache(maxsize=None)
 def create_mark(content, line, col, index):
     return yaml.Mark(
         name="<unicode string>",
         line=line,
         column=col,
-        buffer=f"{content}\x00",
+        buffer=_buffer(content),
         pointer=index,
         index=index,
     )
@@ -709,13 +734,25 @@ def test_visit():
     pos = Position(line=2, col=8)
     found_node = None
 
+    visited = []
+
     def visitor(node: AstNode) -> bool:
-        if pos >= node.start and pos < node.end:
-            nonlocal found_node
-            found_node = node
+        visited.append(node)
+        if not node.start <= pos < node.end:
+            # pos cannot be in any of the children either
+            return False
+        nonlocal found_node
+        found_node = node
         return True
 
     tree.visit(visitor)
+    assert [type(node) for node in visited] == [
+        Tree,
+        StateNode,
+        StateCallNode,
+        StateParameterNode,
+        StateParameterNode,
+    ]
     assert found_node == StateParameterNode(
         start=Position(line=2, col=4),
         end=Position(line=3, col=4),
@@ -724,6 +761,119 @@ def test_visit():
     )
 
 
+def test_visit_skips_children_if_visitor_returns_false():
+    content = """/etc/motd:
+  file.managed:
+    - user: root
+
+/etc/issue:
+  file.managed:
+    - user: root
+"""
+    visited = []
+
+    def visitor(node: AstNode) -> bool:
+        visited.append(node)
+        return (
+            not isinstance(node, StateNode) or node.identifier != "/etc/motd"
+        )
+
+    parse(content).visit(visitor)
+    assert [type(node) for node in visited] == [
+        Tree,
+        StateNode,
+        StateNode,
+        StateCallNode,
+        StateParameterNode,
+    ]
+
+
+def test_position_order():
+    assert Position(line=1, col=5) < Position(line=2, col=0)
+    assert Position(line=2, col=0) < Position(line=2, col=1)
+    assert Position(line=2, col=1) <= Position(line=2, col=1)
+    assert Position(line=3, col=0) >= Position(line=2, col=9)
+    assert not Position(line=2, col=1) > Position(line=2, col=1)
+
+
+def test_nodes_by_start():
+    content = """/etc/systemd/system/rootco-salt-backup.service:
+  file.managed:
+    - user: root
+    - group: root
+"""
+    tree = parse(content)
+    keys, nodes = tree.nodes_by_start()
+
+    assert keys == sorted(keys)
+    assert [type(node) for node in nodes] == [
+        Tree,
+        StateNode,
+        StateCallNode,
+        StateParameterNode,
+        StateParameterNode,
+    ]
+    assert [key[:2] for key in keys] == [
+        (0, 0),
+        (0, 0),
+        (1, 2),
+        (2, 4),
+        (3, 4),
+    ]
+    assert tree.nodes_by_start() is tree.nodes_by_start()
+
+
+def test_multiline_scalar_lines():
+    content = """/etc/motd:
+  file.managed:
+    - contents: |
+        # Welcome
+        to this machine
+    - user: root
+    - group: "wheel
+        # or root"
+"""
+    assert parse(content).multiline_scalar_lines == [(2, 5), (6, 7)]
+
+
+def test_multiline_scalar_lines_after_scan_error():
+    content = """/etc/motd:
+  file.managed:
+    - user: "root
+"""
+    first, last = parse(content).multiline_scalar_lines[-1]
+    assert first <= 2
+    assert last >= 3
+
+
+@pytest.mark.skipif(CSafeLoader is None, reason="PyYAML built without libyaml")
+def test_libyaml_scanner_builds_the_same_tree():
+    content = """include:
+  - opensuse
+
+/etc/motd:
+  file.managed:
+    - contents: |
+        # Welcome
+    - require:
+      - pkg: {name: 'motd', version: 1}
+"""
+    assert Parser(content, CSafeLoader).parse() == Parser(content).parse()
+
+
+@pytest.mark.skipif(CSafeLoader is None, reason="PyYAML built without libyaml")
+def test_libyaml_scanner_raises_scan_errors():
+    content = """/etc/motd:
+  file.managed:
+    - user: "root
+"""
+    with pytest.raises(yaml.scanner.ScannerError):
+        Parser(content, CSafeLoader).parse()
+
+    # parse() recovers using the pure Python scanner
+    assert parse(content) == Parser(content).parse()
+
+
 def test_pop_breadcrumb_from_flow_sequence():
     """
     This is a regression test for https://github.com/dcermak/salt-lsp/issues/3
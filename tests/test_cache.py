@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+from salt_lsp.cache import (
+    CACHE_DIR_NAME,
+    CACHE_FILE_NAME,
+    TreeCache,
+    tree_from_json,
+    tree_to_json,
+)
+from salt_lsp.parser import StateParameterNode, TokenNode, parse
+
+from conftest import open_file, open_workspace, run_salt_server
+
+
+SLS_FILE = """include:
+  - opensuse
+
+extend:
+  /etc/foo.conf:
+    file.managed:
+      - user: root
+
+saltmaster.packages:
+  pkg.installed:
+    - pkgs:
+      - salt-master
+      - sshd
+    - require:
+      - file: /etc/foo.conf
+    - opts: [1, {b: c}]
+"""
+
+
+def test_tree_json_roundtrip():
+    tree = parse(SLS_FILE)
+
+    restored = tree_from_json(json.loads(json.dumps(tree_to_json(tree))))
+
+    assert restored == tree
+
+
+def test_tree_json_roundtrip_restores_parents():
+    restored = tree_from_json(tree_to_json(parse(SLS_FILE)))
+
+    state_call = restored.states[0].states[0]
+    assert state_call.parent is restored.states[0]
+    assert restored.states[0].parent is restored
+
+    pkgs = state_call.parameters[0]
+    assert isinstance(pkgs, StateParameterNode)
+    assert all(isinstance(token, TokenNode) for token in pkgs.value)
+    assert all(token.parent is pkgs for token in pkgs.value)
+
+
+class TestTreeCache:
+    def test_disabled_without_root_path(self):
+        cache = TreeCache(None)
+        cache.put("/foo/bar.sls", 1, parse(SLS_FILE))
+
+        assert cache.get("/foo/bar.sls", 1) is None
+
+    def test_get_checks_the_mtime(self, tmp_path):
+        cache = TreeCache(str(tmp_path))
+        tree = parse(SLS_FILE)
+        cache.put("/foo/bar.sls", 42, tree)
+
+        assert cache.get("/foo/bar.sls", 42) == tree
+        assert cache.get("/foo/bar.sls", 43) is None
+        assert cache.get("/foo/baz.sls", 42) is None
+
+    def test_save_and_load(self, tmp_path):
+        sls_file = tmp_path / "foo.sls"
+        sls_file.write_text(SLS_FILE)
+        mtime = os.stat(sls_file).st_mtime_ns
+
+        cache = TreeCache(str(tmp_path))
+        cache.put(str(sls_file), mtime, parse(SLS_FILE))
+        cache.put(str(tmp_path / "gone.sls"), mtime, parse(SLS_FILE))
+        cache.save()
+
+        assert (tmp_path / CACHE_DIR_NAME / CACHE_FILE_NAME).exists()
+        # the temporary file has been moved into place
+        assert os.listdir(tmp_path / CACHE_DIR_NAME) == [CACHE_FILE_NAME]
+
+        new_cache = TreeCache(str(tmp_path))
+        assert new_cache.get(str(sls_file), mtime) == parse(SLS_FILE)
+        assert new_cache.get(str(tmp_path / "gone.sls"), mtime) is None
+
+    def test_ignores_corrupt_cache_file(self, tmp_path):
+        (tmp_path / CACHE_DIR_NAME).mkdir()
+        (tmp_path / CACHE_DIR_NAME / CACHE_FILE_NAME).write_text("{invalid")
+
+        assert TreeCache(str(tmp_path)).get("/foo/bar.sls", 1) is None
+
+
+def test_server_saves_the_tree_cache_on_shutdown(tmp_path):
+    (tmp_path / "top.sls").write_text("base:\n  '*':\n    - foo\n")
+    (tmp_path / "foo.sls").write_text("include:\n  - bar\n")
+    (tmp_path / "bar.sls").write_text(SLS_FILE)
+    cache_file = tmp_path / CACHE_DIR_NAME / CACHE_FILE_NAME
+
+    with ThreadPoolExecutor(max_workers=1) as executor, run_salt_server(
+        executor, tree_cache=True
+    ) as (client, _):
+        open_workspace(client, f"file://{tmp_path}")
+        open_file(client, str(tmp_path / "foo.sls"))
+
+        assert not cache_file.exists()
+
+    new_cache = TreeCache(str(tmp_path))
+    mtime_ns = os.stat(tmp_path / "bar.sls").st_mtime_ns
+    assert new_cache.get(str(tmp_path / "bar.sls"), mtime_ns) == parse(
+        SLS_FILE
+    )
@@ -1,6 +1,9 @@
+import pickle
 from types import SimpleNamespace
 
-from conftest import MODULE_DOCS
+from salt_lsp.base_types import StateNameCompletion
+
+from conftest import FILE_NAME_COMPLETER, FILE_PARAMS, MODULE_DOCS
 
 
 TEST_FILE = """saltmaster.packages:
@@ -43,3 +46,38 @@ def test_complete_of_file(salt_client_server, file_name_completer):
         for submod_name in file_name_completer["file"].state_sub_names
     ]
     assert completions == expected_completions
+
+
+def test_state_name_completion_from_baredoc_list():
+    completer = StateNameCompletion(
+        "file",
+        [{name: params} for name, params in FILE_PARAMS.items()],
+        MODULE_DOCS,
+    )
+
+    assert completer.state_sub_names == list(FILE_PARAMS)
+    assert completer.state_params == FILE_NAME_COMPLETER["file"].state_params
+
+
+def test_state_name_completion_pickle_roundtrip():
+    completer = StateNameCompletion(
+        "file",
+        {"managed": {"name": None, "source": ""}},
+        {"file": "doc of file", "file.managed": "doc of managed"},
+    )
+
+    restored = pickle.loads(pickle.dumps({"file": completer}))["file"]
+
+    assert restored.state_name == "file"
+    assert restored.state_docs == "doc of file"
+    assert restored.state_sub_names == ["managed"]
+    assert restored.state_params == completer.state_params
+
+
+def test_state_name_completion_does_not_copy_the_parameters():
+    completer = FILE_NAME_COMPLETER["file"]
+
+    assert all(
+        completer.state_params[name].parameters is params
+        for name, params in FILE_PARAMS.items()
+    )
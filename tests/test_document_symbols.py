@@ -1,4 +1,5 @@
 from pygls.lsp import types
+import pytest
 
 from salt_lsp.document_symbols import tree_to_document_symbols
 from salt_lsp.parser import parse
@@ -26,11 +27,13 @@ touch /var/log:
 """
 
 
-TREE = parse(SLS_FILE)
+@pytest.fixture(scope="module")
+def tree():
+    return parse(SLS_FILE)
 
 
-def test_document_symbols(file_name_completer):
-    doc_symbols = tree_to_document_symbols(TREE, file_name_completer)
+def test_document_symbols(tree, file_name_completer):
+    doc_symbols = tree_to_document_symbols(tree, file_name_completer)
 
     assert doc_symbols == [
         types.DocumentSymbol(
@@ -68,3 +68,43 @@ def test_find_id_in_indirect_include(salt_client_server, sample_workspace):
             end=Position(line=6, character=0),
         ),
     )
+
+
+def test_find_id_with_cyclic_includes(salt_client_server, tmp_path):
+    client, server = salt_client_server
+
+    (tmp_path / "top.sls").write_text("base:\n  '*':\n    - foo\n")
+    (tmp_path / "foo.sls").write_text("include:\n  - bar\n")
+    (tmp_path / "bar.sls").write_text(
+        """include:
+  - foo
+
+/root/.fishrc:
+  file.managed:
+    - user: root
+"""
+    )
+
+    open_workspace(client, f"file://{tmp_path}")
+
+    foo_sls_path = f"{tmp_path}/foo.sls"
+    foo_sls_uri = "file://" + foo_sls_path
+    open_file(client, foo_sls_path)
+
+    bar_sls_path = f"{tmp_path}/bar.sls"
+    # the includes stop once a file is reached a second time
+    assert [str(inc) for inc in server.workspace.includes[foo_sls_uri]] == [
+        "file://" + bar_sls_path
+    ]
+    assert [str(inc) for inc in server.workspace.includes[bar_sls_path]] == [
+        foo_sls_uri
+    ]
+    assert server.find_id_in_doc_and_includes(
+        "/root/.fishrc", foo_sls_uri
+    ) == Location(
+        uri="file://" + bar_sls_path,
+        range=Range(
+            start=Position(line=3, character=0),
+            end=Position(line=6, character=0),
+        ),
+    )
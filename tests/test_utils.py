@@ -5,15 +5,25 @@ from pygls.lsp import types
 
 from salt_lsp.utils import (
     ast_node_to_range,
+    construct_path_to_position,
     get_git_root,
     get_last_element_of_iterator,
+    get_sls_includes,
     get_top,
     is_valid_file_uri,
+    position_to_index,
     FileUri,
+    LruDict,
     UriDict,
     Uri,
 )
-from salt_lsp.parser import IncludeNode, Position
+from salt_lsp.parser import (
+    IncludeNode,
+    Position,
+    RequisiteNode,
+    StateParameterNode,
+    parse,
+)
 
 
 def test_last_element_of_range():
@@ -24,6 +34,20 @@ def test_last_element_of_empty_range():
     assert get_last_element_of_iterator(range(0)) is None
 
 
+def test_position_to_index():
+    text = "foo:\n  bar: baz\n\nqux\n"
+
+    assert position_to_index(text, 0, 0) == 0
+    assert position_to_index(text, 0, 3) == 3
+    assert position_to_index(text, 1, 2) == 7
+    assert text[position_to_index(text, 1, 2)] == "b"
+    assert text[position_to_index(text, 3, 0)] == "q"
+
+
+def test_position_to_index_past_the_last_line():
+    assert position_to_index("foo\nbar", 5, 1) == 8
+
+
 class TestFileUri:
     def test_file_uri_construction(self):
         path = "/path/to/file"
@@ -151,3 +175,69 @@ class TestUriDict:
         ):
             d[key] = 42 + i
             assert d[p] == 42 + i
+
+    def test_rejects_invalid_uris(self):
+        d = UriDict()
+
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                d["https://foo.bar.xyz"] = 1
+
+
+def test_lru_dict_evicts_the_least_recently_used_element():
+    d = LruDict(2)
+    d["a"] = 1
+    d["b"] = 2
+
+    assert d["a"] == 1
+    d["c"] = 3
+
+    assert dict(d) == {"a": 1, "c": 3}
+    assert d.get("b") is None
+
+
+def test_get_sls_includes(tmp_path):
+    for sls_file in (
+        "top.sls",
+        "foo.sls",
+        "bar/init.sls",
+        "bar/baz.sls",
+        "bar/qux/init.sls",
+        "bar/qux/README",
+    ):
+        (tmp_path / sls_file).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / sls_file).write_text("")
+
+    assert sorted(get_sls_includes(str(tmp_path / "foo.sls"))) == [
+        "bar",
+        "bar.baz",
+        "bar.qux",
+        "foo",
+        "top",
+    ]
+
+
+def test_construct_path_to_position_at_the_end_of_the_requisites():
+    tree = parse(
+        """/etc/foo.conf:
+  file.managed:
+    - require:
+      - user: root
+    - user: root
+"""
+    )
+
+    # the requisite ends where the following parameter starts, as before the
+    # node that is visited last (the requisite) is preferred
+    assert isinstance(
+        construct_path_to_position(tree, types.Position(line=4, character=4))[
+            -1
+        ],
+        RequisiteNode,
+    )
+    assert isinstance(
+        construct_path_to_position(tree, types.Position(line=4, character=5))[
+            -1
+        ],
+        StateParameterNode,
+    )
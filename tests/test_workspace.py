@@ -0,0 +1,279 @@
+from types import SimpleNamespace
+import os
+
+from pygls.lsp.types import (
+    Position,
+    Range,
+    TextDocumentContentChangeEvent,
+    TextDocumentSyncKind,
+    VersionedTextDocumentIdentifier,
+    WorkspaceFolder,
+)
+import pytest
+
+from salt_lsp.cache import CACHE_DIR_NAME, CACHE_FILE_NAME
+from salt_lsp.parser import IncludeNode, parse
+from salt_lsp.workspace import SlsFileWorkspace
+
+
+SLS_FILE = """/etc/foo.conf:
+  file.managed:
+    - user: root
+"""
+
+
+@pytest.fixture
+def workspace():
+    return SlsFileWorkspace({}, "file:///", TextDocumentSyncKind.INCREMENTAL)
+
+
+def test_unchanged_document_is_not_reparsed(workspace):
+    txt_doc = SimpleNamespace(uri="file:///foo.sls", text=SLS_FILE, version=0)
+
+    workspace.put_document(txt_doc)
+    tree = workspace.trees[txt_doc.uri]
+    symbols = workspace.get_document_symbols(txt_doc.uri)
+
+    workspace.put_document(txt_doc)
+    assert workspace.trees[txt_doc.uri] is tree
+    assert workspace.get_document_symbols(txt_doc.uri) is symbols
+
+    workspace.put_document(
+        SimpleNamespace(uri=txt_doc.uri, text=SLS_FILE + "\n", version=1)
+    )
+    assert workspace.trees[txt_doc.uri] is not tree
+    assert workspace.get_document_symbols(txt_doc.uri) is not symbols
+
+
+def test_document_symbols_of_unknown_document(workspace):
+    assert workspace.get_document_symbols("file:///foo.sls") == []
+
+
+def test_get_workspace_of_document_prefers_nested_folders(tmp_path):
+    outer = f"file://{tmp_path}"
+    inner = f"file://{tmp_path}/salt"
+    workspace = SlsFileWorkspace(
+        {},
+        "file:///",
+        None,
+        [
+            WorkspaceFolder(uri=outer, name="outer"),
+            WorkspaceFolder(uri=inner, name="inner"),
+        ],
+    )
+
+    assert workspace._get_workspace_of_document(f"{inner}/foo.sls") == inner
+    assert workspace._get_workspace_of_document(f"{outer}/foo.sls") == outer
+    assert workspace._get_workspace_of_document(f"{inner}2/foo.sls") == outer
+    assert (
+        workspace._get_workspace_of_document("file:///srv/foo.sls")
+        == "file:///"
+    )
+
+    workspace.remove_folder(inner)
+    assert workspace._get_workspace_of_document(f"{inner}/foo.sls") == outer
+
+
+COMMENTED_SLS_FILE = """# managed by salt
+/etc/foo.conf:
+  file.managed:
+    # the owner
+    - user: root
+    - contents: |
+        # not a comment
+"""
+
+
+def _edit(line: int, start: int, end: int, text: str):
+    return TextDocumentContentChangeEvent(
+        range=Range(
+            start=Position(line=line, character=start),
+            end=Position(line=line, character=end),
+        ),
+        text=text,
+    )
+
+
+def test_editing_a_comment_keeps_the_tree(workspace):
+    uri = "file:///foo.sls"
+    workspace.put_document(
+        SimpleNamespace(uri=uri, text=COMMENTED_SLS_FILE, version=0)
+    )
+    tree = workspace.trees[uri]
+
+    for version, change in enumerate(
+        (_edit(0, 2, 9, "generated"), _edit(3, 15, 15, " of the file")),
+        start=1,
+    ):
+        workspace.update_document(
+            VersionedTextDocumentIdentifier(uri=uri, version=version), change
+        )
+        assert workspace.trees[uri] is tree
+
+    assert workspace.get_document(uri).source.startswith(
+        "# generated by salt\n"
+    )
+
+
+def test_editing_a_comment_like_scalar_reparses(workspace):
+    uri = "file:///foo.sls"
+    workspace.put_document(
+        SimpleNamespace(uri=uri, text=COMMENTED_SLS_FILE, version=0)
+    )
+
+    for version, change in enumerate(
+        (
+            # inside the block scalar
+            _edit(6, 14, 17, "really"),
+            # uncomments the line
+            _edit(3, 4, 6, ""),
+            # adds a new line
+            _edit(0, 1, 1, "\n"),
+        ),
+        start=1,
+    ):
+        tree = workspace.trees[uri]
+        workspace.update_document(
+            VersionedTextDocumentIdentifier(uri=uri, version=version), change
+        )
+        assert workspace.trees[uri] is not tree
+
+
+@pytest.mark.parametrize(
+    "change",
+    (
+        # ends after the last character and thus removes the line break
+        _edit(0, 2, 18, "x"),
+        # YAML line breaks other than \n and \r
+        _edit(0, 2, 2, "\u2028/etc/bar.conf: {}"),
+    ),
+)
+def test_editing_a_comment_beyond_its_line_reparses(workspace, change):
+    uri = "file:///foo.sls"
+    workspace.put_document(
+        SimpleNamespace(uri=uri, text=COMMENTED_SLS_FILE, version=0)
+    )
+    tree = workspace.trees[uri]
+
+    workspace.update_document(
+        VersionedTextDocumentIdentifier(uri=uri, version=1), change
+    )
+
+    assert workspace.trees[uri] is not tree
+    assert workspace.trees[uri] == parse(workspace.get_document(uri).source)
+
+
+def test_editing_a_comment_without_incremental_sync_reparses():
+    workspace = SlsFileWorkspace({}, "file:///", TextDocumentSyncKind.FULL)
+    uri = "file:///foo.sls"
+    workspace.put_document(
+        SimpleNamespace(uri=uri, text=COMMENTED_SLS_FILE, version=0)
+    )
+    tree = workspace.trees[uri]
+
+    workspace.update_document(
+        VersionedTextDocumentIdentifier(uri=uri, version=1),
+        _edit(0, 2, 9, "generated"),
+    )
+
+    assert workspace.get_document(uri).source == "generated"
+    assert workspace.trees[uri] is not tree
+
+
+def test_parse_cache_is_shared_by_workspaces():
+    parse_cache = {}
+    first, second = (
+        SlsFileWorkspace({}, "file:///", None, parse_cache=parse_cache)
+        for _ in range(2)
+    )
+
+    for workspace in (first, second):
+        workspace.put_document(
+            SimpleNamespace(uri="file:///foo.sls", text=SLS_FILE, version=0)
+        )
+
+    assert len(parse_cache) == 1
+    assert first.trees["file:///foo.sls"] is second.trees["file:///foo.sls"]
+
+
+def test_includes_are_looked_up_once_per_document(tmp_path, monkeypatch):
+    (tmp_path / "top.sls").write_text("base:\n  '*':\n    - foo\n")
+    (tmp_path / "foo.sls").write_text("include:\n  - bar\n")
+    (tmp_path / "bar.sls").write_text("include:\n  - baz\n")
+    (tmp_path / "baz.sls").write_text("include:\n  - foo\n")
+
+    looked_up = []
+    get_file = IncludeNode.get_file
+
+    def counting_get_file(self, top_path):
+        looked_up.append(self.value)
+        return get_file(self, top_path)
+
+    monkeypatch.setattr(IncludeNode, "get_file", counting_get_file)
+
+    workspace = SlsFileWorkspace(
+        {},
+        f"file://{tmp_path}",
+        None,
+        [WorkspaceFolder(uri=f"file://{tmp_path}", name="salt")],
+    )
+    foo_uri = f"file://{tmp_path}/foo.sls"
+    workspace.put_document(
+        SimpleNamespace(
+            uri=foo_uri, text=(tmp_path / "foo.sls").read_text(), version=0
+        )
+    )
+
+    assert sorted(looked_up) == ["bar", "baz", "foo"]
+    assert [str(inc) for inc in workspace.includes[foo_uri]] == [
+        f"file://{tmp_path}/bar.sls",
+        f"file://{tmp_path}/baz.sls",
+    ]
+
+
+def test_included_trees_are_reused_from_the_tree_cache(tmp_path, monkeypatch):
+    (tmp_path / "top.sls").write_text("base:\n  '*':\n    - foo\n")
+    (tmp_path / "foo.sls").write_text("include:\n  - bar\n")
+    bar_sls = tmp_path / "bar.sls"
+    bar_sls.write_text(SLS_FILE)
+    foo_uri = f"file://{tmp_path}/foo.sls"
+    bar_uri = f"file://{bar_sls}"
+
+    parsed = []
+
+    def counting_parse(source):
+        parsed.append(source)
+        return parse(source)
+
+    monkeypatch.setattr("salt_lsp.workspace.parse", counting_parse)
+
+    def open_foo():
+        workspace = SlsFileWorkspace(
+            {},
+            f"file://{tmp_path}",
+            TextDocumentSyncKind.INCREMENTAL,
+            [WorkspaceFolder(uri=f"file://{tmp_path}", name="salt")],
+        )
+        workspace.put_document(
+            SimpleNamespace(
+                uri=foo_uri,
+                text=(tmp_path / "foo.sls").read_text(),
+                version=0,
+            )
+        )
+        return workspace
+
+    open_foo().save_tree_cache()
+    assert (tmp_path / CACHE_DIR_NAME / CACHE_FILE_NAME).exists()
+    assert parsed.count(SLS_FILE) == 1
+
+    # the included file is unchanged => its tree is loaded from the cache
+    workspace = open_foo()
+    assert parsed.count(SLS_FILE) == 1
+    assert workspace.trees[bar_uri] == parse(SLS_FILE)
+
+    # the included file has been modified => it is parsed again
+    mtime_ns = os.stat(bar_sls).st_mtime_ns
+    os.utime(bar_sls, ns=(mtime_ns, mtime_ns + 1))
+    open_foo()
+    assert parsed.count(SLS_FILE) == 2